@@ -0,0 +1,124 @@
+"""
+========
+Encoders
+========
+Pluggable JSON backends shared by :class:`ab_drf.renderer.CustomRenderer` and
+:class:`ab_drf.parsers.CustomJSONParser`.
+
+The backend is picked with ``AB_DRF_JSON_BACKEND``:
+
+* ``'json'`` (default): the standard library, exactly what DRF's ``JSONRenderer`` does.
+* ``'orjson'``: the native `orjson <https://github.com/ijl/orjson>`_ encoder, which handles
+  ``datetime``, ``UUID`` and dict subclasses itself and falls back to DRF's ``JSONEncoder``
+  for the rest (``Decimal``, lazy strings, generators...). When ``orjson`` is not installed
+  the standard library is used instead.
+
+.. note:: ``orjson`` renders non-finite floats as ``null`` and writes float exponents
+   without the ``+`` sign (``1e16`` instead of ``1e+16``). Everything else is identical.
+"""
+
+__all__ = ['get_json_backend', 'JSONBackend', 'OrjsonBackend']
+
+import codecs
+import json
+
+from django.conf import settings
+from django.test.signals import setting_changed
+from rest_framework.utils.json import strict_constant
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_LINE_SEPARATORS = (('\u2028', '\\u2028'), ('\u2029', '\\u2029'))
+
+
+class JSONBackend:
+    """
+    Standard library backend. Output is the same as DRF's ``JSONRenderer.render()``
+    """
+    name = 'json'
+
+    def dumps(self, data, encoder_class, ensure_ascii=False, allow_nan=True, indent=None,
+              separators=None):
+        ret = json.dumps(
+            data, cls=encoder_class, indent=indent, ensure_ascii=ensure_ascii,
+            allow_nan=allow_nan, separators=separators
+        )
+
+        # We always fully escape \u2028 and \u2029 to ensure we output JSON
+        # that is a strict javascript subset.
+        for char, escaped in _LINE_SEPARATORS:
+            ret = ret.replace(char, escaped)
+        return ret.encode()
+
+    def loads(self, data, encoding='utf-8', strict=True):
+        parse_constant = strict_constant if strict else None
+        return json.loads(codecs.decode(data, encoding), parse_constant=parse_constant)
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    ``orjson`` backend. Whatever ``orjson`` can't produce identically (pretty printing,
+    spaced separators, ASCII escaping, lax parsing, non UTF-8 input) goes through the
+    standard library.
+    """
+    name = 'orjson'
+
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, data, encoder_class, ensure_ascii=False, allow_nan=True, indent=None,
+              separators=None):
+        if indent is not None or ensure_ascii or separators not in (None, (',', ':')):
+            return super().dumps(data, encoder_class, ensure_ascii, allow_nan, indent,
+                                 separators)
+
+        try:
+            ret = orjson.dumps(data, default=encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # Integers over 64 bits, recursion limit... let the stdlib deal with it
+            return super().dumps(data, encoder_class, ensure_ascii, allow_nan, indent,
+                                 separators)
+
+        if b'\xe2\x80' in ret:
+            for char, escaped in _LINE_SEPARATORS:
+                ret = ret.replace(char.encode(), escaped.encode())
+        return ret
+
+    def loads(self, data, encoding='utf-8', strict=True):
+        if not strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().loads(data, encoding, strict)
+        return orjson.loads(data)
+
+
+_backends = {
+    JSONBackend.name: JSONBackend(),
+    OrjsonBackend.name: OrjsonBackend() if orjson else JSONBackend(),
+}
+_default_backend = None
+
+
+def get_json_backend(name=None):
+    """
+    Returns the backend registered as ``name``, or the one configured with
+    ``AB_DRF_JSON_BACKEND`` if ``name`` is not given.
+    """
+    global _default_backend
+
+    if name is not None:
+        return _backends[name]
+
+    if _default_backend is None:
+        _default_backend = _backends[getattr(settings, 'AB_DRF_JSON_BACKEND', 'json')]
+    return _default_backend
+
+
+def reload_json_backend(*args, **kwargs):
+    global _default_backend
+
+    if kwargs.get('setting') == 'AB_DRF_JSON_BACKEND':
+        _default_backend = None
+
+
+setting_changed.connect(reload_json_backend)
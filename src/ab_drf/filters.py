@@ -1,8 +1,43 @@
-from django.db.models import Q
+import operator
+import re
+from functools import lru_cache, reduce
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Exists, Field, IntegerField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.constants import LOOKUP_SEP
 from rest_framework import filters
 from django_filters import Filter
 from rest_framework import serializers
 
+OWNERSHIP_STRATEGIES = ('in', 'union', 'exists', 'auto')
+# Parameters per statement of backends whose Django features don't tell
+MAX_QUERY_PARAMS = {'microsoft': 2100}
+RANGE_RE = re.compile(r'^(\d+)\s*-\s*(\d+)$')
+
+
+@lru_cache(maxsize=None)
+def crosses_to_many(model, path):
+    """
+    Whether the lookup ``path`` (``'project__members'``) of ``model`` follows a one-to-many or
+    many-to-many relation, i.e. may match a row more than once when joined
+    """
+    for name in path.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # A lookup or a transform, the path ends here
+            return False
+
+        if field.one_to_many or field.many_to_many:
+            return True
+        if not field.is_relation:
+            return False
+        model = field.related_model
+    return False
 
 
 class OwnerOrStaffFilterBackend(filters.BaseFilterBackend):
@@ -15,6 +50,18 @@ class OwnerOrStaffFilterBackend(filters.BaseFilterBackend):
 
     As a matter of organization's staff/admin seeing other user's data is prevented with
     `OrganizationFilterBackend`
+
+    The query is built following the view's `ownership_filter_strategy`, or the
+    `AB_DRF_OWNERSHIP_FILTER_STRATEGY` setting:
+
+    * ``'in'``: `id IN (SELECT id ... WHERE field_1 = user OR field_2 = user ...)`
+    * ``'union'``: the same with one `SELECT` per field, joined with `UNION`, each of which
+      can use the index of its own field
+    * ``'exists'``: `WHERE EXISTS (SELECT ... WHERE id = outer.id AND field = user) OR ...`
+    * ``'auto'`` (the default): a single field not crossing a to-many relation (see
+      :func:`crosses_to_many`) is filtered on directly, as it can't duplicate rows, anything
+      else goes through ``'union'``: an `OR` across columns keeps the database from using their
+      indexes (see `tests/bench_filters.py`)
     """
 
     def filter_queryset(self, request, queryset, view):
@@ -29,25 +76,77 @@ class OwnerOrStaffFilterBackend(filters.BaseFilterBackend):
         if user.is_superuser or user.is_staff:
             return queryset
 
+        strategy = self.get_strategy(view)
+        return getattr(self, 'filter_%s' % strategy)(queryset, ownership_filter_fields, user.id)
+
+    def get_strategy(self, view):
+        strategy = getattr(view, 'ownership_filter_strategy', None) or getattr(
+            settings, 'AB_DRF_OWNERSHIP_FILTER_STRATEGY', 'auto'
+        )
+        if strategy not in OWNERSHIP_STRATEGIES:
+            raise ImproperlyConfigured(
+                'Unknown ownership filter strategy %r, expected one of %s'
+                % (strategy, ', '.join(OWNERSHIP_STRATEGIES))
+            )
+        return strategy
+
+    def filter_in(self, queryset, fields, user_id):
         q = Q()
-        for field in ownership_filter_fields:
-            q |= Q(**{field: user.id})
+        for field in fields:
+            q |= Q(**{field: user_id})
 
         # The reason behind not directly filtering the original queryset with the filter fields
         # it gets duplicated when there's OneToMany fields are being filtered.
         # Distinct can be added but it'll become trickier with custom ordering as 'id' field
         # would always be present in ordering fields
         qs = queryset.model.objects.filter(q).values_list('id', flat=True)
-        queryset = queryset.filter(id__in=qs)
+        return queryset.filter(id__in=qs)
 
-        return queryset
+    def filter_union(self, queryset, fields, user_id):
+        model = queryset.model
+        subqueries = [model._base_manager.filter(**{field: user_id}).values('pk').order_by()
+                      for field in fields]
+        return queryset.filter(pk__in=subqueries[0].union(*subqueries[1:]))
+
+    def filter_exists(self, queryset, fields, user_id):
+        conditions = [self.exists(queryset.model, field, user_id) for field in fields]
+        # Not starting from an empty Q(), which can't be combined with an expression on Django 3.2
+        return queryset.filter(reduce(operator.or_, conditions))
+
+    def filter_auto(self, queryset, fields, user_id):
+        if len(fields) == 1 and not crosses_to_many(queryset.model, fields[0]):
+            return queryset.filter(**{fields[0]: user_id})
+        return self.filter_union(queryset, fields, user_id)
+
+    def exists(self, model, field, user_id):
+        return Q(Exists(model._base_manager.filter(**{'pk': OuterRef('pk'), field: user_id})))
 
 
 class ListFilterField(Filter):
     """This is a custom FilterField to enable a behavior like:
     ?id=1,2,3,4 ...
+
+    Values are converted by the filtered model field, so UUIDs and other types work too, and
+    deduplicated. On integer fields ranges are accepted, ``?id=1-500,700``, and consecutive
+    values are merged into ranges, each costing two query parameters whatever its length.
+
+    ``.distinct()`` is only added when the field crosses a to-many relation (see
+    :func:`crosses_to_many`). Lists longer than ``array_threshold`` are sent as a single array
+    parameter on PostgreSQL. Elsewhere every value is a parameter: they are split in ``IN``
+    clauses of at most ``chunk_size`` values (Oracle takes 1000 per list), and lists needing more
+    parameters than the backend allows per statement (999 on SQLite, 2100 on SQL Server), less
+    ``reserved_params`` for the rest of the query, are refused. So are more than ``max_values``
+    values or ranges.
     """
 
+    def __init__(self, *args, max_values=10000, chunk_size=500, array_threshold=100,
+                 reserved_params=100, **kwargs):
+        self.max_values = max_values
+        self.chunk_size = chunk_size
+        self.array_threshold = array_threshold
+        self.reserved_params = reserved_params
+        super(ListFilterField, self).__init__(*args, **kwargs)
+
     def filter(self, queryset, value):
 
         # If no value is passed, just return the
@@ -55,14 +154,150 @@ class ListFilterField(Filter):
         if not value:
             return queryset
 
-        self.lookup_expr = "in"  # Setting the lookupexpression for all values
-        list_values = value.split(",")  # Split the incoming querystring by comma
+        model_field = get_path_field(queryset.model, self.field_name)
+        values, ranges = self.parse(value, model_field)
+        if not values and not ranges:
+            raise serializers.ValidationError("No values in {}.".format(value))
+        if len(values) + len(ranges) > self.max_values:
+            raise serializers.ValidationError(
+                "At most {} values are allowed.".format(self.max_values)
+            )
 
-        if not all(
-            [item.isdigit() for item in list_values]
-        ):  # In this case, I check on isdigit()
+        connection = connections[queryset.db]
+        max_params = self.get_max_params(connection)
+        if max_params is not None and self.count_params(values, ranges, connection) > max_params:
             raise serializers.ValidationError(
-                "All values in {}s are not integer.".format(str(list_values))
+                "At most {} values are allowed.".format(max_params)
             )
-        # If everything is fine, Just pass the execution to the Filter-class
-        return super(ListFilterField, self).filter(queryset, list_values).distinct()
\ No newline at end of file
+
+        vendor = connection.vendor
+        queryset = self.get_method(queryset)(self.get_condition(values, ranges, vendor))
+        if self.distinct or crosses_to_many(queryset.model, self.field_name):
+            queryset = queryset.distinct()
+        return queryset
+
+    def parse(self, value, model_field):
+        """
+        Returns the distinct converted values and, on integer fields, the ``(first, last)``
+        ranges, merged
+        """
+        integer = isinstance(model_field, IntegerField)
+        values = {}
+        ranges = []
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+
+            match = RANGE_RE.match(item) if integer else None
+            try:
+                if match:
+                    first, last = (model_field.to_python(bound) for bound in match.groups())
+                    if first > last:
+                        raise DjangoValidationError('Empty range')
+                    ranges.append((first, last))
+                else:
+                    values.setdefault(model_field.to_python(item), None)
+            except DjangoValidationError:
+                raise serializers.ValidationError("{} is not a valid value.".format(item))
+
+        values = list(values)
+        if integer:
+            values, ranges = merge_ranges(values, ranges)
+        return values, ranges
+
+    def use_array(self, values, vendor):
+        return vendor == "postgresql" and len(values) > self.array_threshold
+
+    def count_params(self, values, ranges, connection):
+        values_params = 1 if self.use_array(values, connection.vendor) else len(values)
+        return values_params + 2 * len(ranges)
+
+    def get_max_params(self, connection):
+        """
+        Parameters the values may take in a statement, ``None`` meaning no limit
+        """
+        limit = connection.features.max_query_params or MAX_QUERY_PARAMS.get(connection.vendor)
+        if limit is None:
+            return None
+        return max(limit - self.reserved_params, 1)
+
+    def get_condition(self, values, ranges, vendor):
+        name = self.field_name
+        q = Q()
+        for first, last in ranges:
+            q |= Q(**{"%s__range" % name: (first, last)})
+
+        if self.use_array(values, vendor):
+            # One parameter, however long the list
+            q |= Q(**{"%s__in" % name: RawSQL("SELECT unnest(%s)", (values,))})
+        else:
+            for start in range(0, len(values), self.chunk_size):
+                q |= Q(**{"%s__in" % name: values[start:start + self.chunk_size]})
+        return q
+
+
+def get_path_field(model, path):
+    """
+    The field holding the values compared by the lookup ``path``: the last field, or the primary
+    key of the model a relation points to. Past the last field, the output field of the
+    transforms that follow (``created_at__date`` compares dates).
+    """
+    field = None
+    names = path.split(LOOKUP_SEP)
+    for index, name in enumerate(names):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            if field is None:
+                raise
+            # A lookup or a transform, the path ends here
+            return get_transform_field(get_value_field(field, model), names[index:])
+
+        if field.is_relation:
+            model = field.related_model
+    return get_value_field(field, model)
+
+
+def get_value_field(field, related_model):
+    if field.many_to_one or (field.one_to_one and field.concrete):
+        return field.target_field
+    if field.is_relation:
+        return related_model._meta.pk
+    return field
+
+
+def get_transform_field(field, names):
+    for name in names:
+        transform = field.get_transform(name)
+        if transform is None:
+            break
+        # Set on the class by most built-in transforms (`TruncDate`, `ExtractYear`...), the
+        # others keep the type of their input (`Lower`)
+        output_field = getattr(transform, 'output_field', None)
+        if isinstance(output_field, Field):
+            field = output_field
+    return field
+
+
+def merge_ranges(values, ranges):
+    """
+    Merges integer ``values`` and ``(first, last)`` ``ranges`` that overlap or follow each other.
+    Returns the values left alone and the ranges of more than two values.
+    """
+    intervals = sorted([(value, value) for value in values] + list(ranges))
+    merged = []
+    for first, last in intervals:
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+
+    values = []
+    ranges = []
+    for first, last in merged:
+        if last - first < 2:
+            values.extend(range(first, last + 1))
+        else:
+            ranges.append((first, last))
+    return values, ranges
@@ -5,17 +5,237 @@ Handlers
 Holds logger handler classes
 """
 
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.http import HttpRequest
 from raven.contrib.django.raven_compat import handlers
+from raven.utils.stacks import iter_stack_frames
 
 
 class SentryHandler(handlers.SentryHandler):
     """
     Extends SentryHandler feature that adds thread id to record
+
+    With ``asynchronous``, records are put in a bounded in-memory queue and sent by a background
+    thread, so a slow or unreachable Sentry doesn't delay responses. The thread takes up to
+    ``batch_size`` records off the queue at a time, to hold the queue lock once per group rather
+    than once per record, but each record is still sent in its own request: Sentry's store API
+    takes a single event. When the queue holds ``queue_size`` records the oldest one is dropped and counted
+    in :attr:`dropped`. Pending records are flushed, for at most ``flush_timeout`` seconds, when
+    logging shuts down::
+
+        LOGGING = {
+            'handlers': {
+                'sentry': {
+                    'level': 'ERROR',
+                    'class': 'ab_drf.handlers.SentryHandler',
+                    'asynchronous': True,
+                    'queue_size': 1000,
+                },
+            },
+            ...
+        }
+
+    The background thread already keeps the network off the request path, so use it with a
+    synchronous raven transport (``'transport': 'raven.transport.http.HTTPTransport'`` in
+    ``RAVEN_CONFIG``): raven's threaded transport stops before logging shuts down and would lose
+    the flushed records. raven's thread local context is not carried over to the background
+    thread. The request is read (user, URL, headers, body...) when the record is queued, the
+    background thread only gets that data, never the request itself.
+
+    With ``rate_limit``, records sharing a fingerprint (see :meth:`get_fingerprint`) go through a
+    token bucket allowing ``rate_limit`` events per minute, with bursts of ``rate_burst``. The
+    others are dropped before any work is done for them and counted in :attr:`suppressed`; the
+    next event of the same fingerprint carries the count in its ``suppressed_duplicates`` extra.
+    At most ``max_fingerprints`` buckets are kept, least recently used first out.
     """
 
+    def __init__(self, *args, **kwargs):
+        self.asynchronous = kwargs.pop('asynchronous', False)
+        self.queue_size = kwargs.pop('queue_size', 1000)
+        self.batch_size = kwargs.pop('batch_size', 50)
+        self.flush_timeout = kwargs.pop('flush_timeout', 5)
+        self.rate_limit = kwargs.pop('rate_limit', None)
+        self.rate_burst = kwargs.pop('rate_burst', 10)
+        self.max_fingerprints = kwargs.pop('max_fingerprints', 1000)
+        super(SentryHandler, self).__init__(*args, **kwargs)
+
+        self.dropped = 0
+        self.suppressed = 0
+        self._buckets = OrderedDict()
+        self._buckets_lock = threading.Lock()
+        self._queue = deque()
+        self._sending = 0
+        self._stopping = False
+        self._worker = None
+        self._worker_pid = None
+        self._queue_lock = threading.Lock()
+        self._not_empty = threading.Condition(self._queue_lock)
+        self._sent = threading.Condition(self._queue_lock)
+
+    def emit(self, record):
+        if self.rate_limit is not None and not self.allow(record):
+            return
+
+        if not self.asynchronous or self._stopping:
+            return super(SentryHandler, self).emit(record)
+
+        # The worker would capture its own stack
+        if getattr(record, 'stack', None) is True:
+            record.stack = list(iter_stack_frames())
+
+        self.detach_request(record)
+        self.enqueue(record)
+
+    def detach_request(self, record):
+        """
+        Replaces the request of a record with the data raven reads from it, while the request is
+        still live: the worker must not resolve ``request.user`` or read ``request.body`` after
+        the response is sent
+        """
+        request = getattr(record, 'request', None)
+        if not isinstance(request, HttpRequest):
+            return
+
+        del record.request
+        record._request_id = getattr(request, 'id', None)
+        get_data_from_request = getattr(self.client, 'get_data_from_request', None)
+        if get_data_from_request is not None:
+            record._request_data = get_data_from_request(request)
+
+    def get_fingerprint(self, record):
+        """
+        Exception type and culprit, as computed by
+        :func:`ab_drf.helpers.custom_exception_handler`
+        """
+        exc_type = record.exc_info[0] if record.exc_info else None
+        culprit = getattr(record, 'culprit', None)
+        if culprit is None:
+            culprit = '%s in %s' % (record.name, record.funcName)
+        return getattr(exc_type, '__name__', None), culprit
+
+    def allow(self, record):
+        """
+        Takes a token from the bucket of the record's fingerprint. Returns whether the record
+        can be sent.
+        """
+        key = self.get_fingerprint(record)
+        now = time.monotonic()
+
+        with self._buckets_lock:
+            # [tokens, last refill, suppressed since the last event]
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.rate_burst, now, 0]
+                if len(self._buckets) > self.max_fingerprints:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                refill = (now - bucket[1]) * self.rate_limit / 60
+                bucket[0] = min(self.rate_burst, bucket[0] + refill)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            record.suppressed_duplicates = suppressed
+        return True
+
+    def enqueue(self, record):
+        with self._queue_lock:
+            self._ensure_worker()
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()
+                self.dropped += 1
+
+            self._queue.append(record)
+            self._not_empty.notify()
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid:
+            return
+
+        if self._worker_pid is not None and self._worker_pid != pid:
+            # Forked: the parent process sends its own records
+            self._queue.clear()
+            self._sending = 0
+
+        self._worker_pid = pid
+        self._worker = threading.Thread(target=self._run, name='ab_drf.SentryHandler', daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._queue_lock:
+                while not self._queue and not self._stopping:
+                    self._not_empty.wait()
+
+                if not self._queue:
+                    return
+
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.batch_size, len(self._queue)))]
+                self._sending = len(batch)
+
+            # One request per record, outside of the lock
+            for record in batch:
+                self.send(record)
+
+            with self._queue_lock:
+                self._sending = 0
+                self._sent.notify_all()
+
+    def send(self, record):
+        request_data = getattr(record, '_request_data', None)
+        try:
+            if request_data is not None:
+                # Merged into the event by raven, see `raven.base.Client.build_msg`
+                self.client.context.merge(request_data)
+            super(SentryHandler, self).emit(record)
+        except Exception:
+            # raven re-raises when `raise_send_errors` is on, the worker must survive it
+            self.handleError(record)
+        finally:
+            if request_data is not None:
+                self.client.context.clear()
+
+    def flush(self, timeout=None):
+        """
+        Waits until the queued records are sent, for at most ``timeout`` seconds (defaults to
+        ``flush_timeout``). Returns whether the queue is empty.
+        """
+        if timeout is None:
+            timeout = self.flush_timeout
+
+        deadline = time.monotonic() + timeout
+        with self._queue_lock:
+            while self._queue or self._sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._worker is None or not self._worker.is_alive():
+                    return False
+                self._sent.wait(remaining)
+        return True
+
+    def close(self):
+        self.flush()
+        with self._queue_lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+        super(SentryHandler, self).close()
+
     def _emit(self, record):
         request = getattr(record, 'request', None)
-        request_id = None
+        request_id = getattr(record, '_request_id', None)
         if request:
             request_id = getattr(request, 'id', None)
 
@@ -7,19 +7,25 @@ Useful helper methods that frequently used in this project
 
 __all__ = ['custom_exception_handler']
 
-import inspect
 import logging
 import mimetypes
 import os
+import datetime
 import re
-import traceback
 import json
+import time
 
 import sys
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.http import HttpResponse
 from rest_framework.views import exception_handler
 from django.contrib.admin.utils import NestedObjects
+from django.db.models import CASCADE, QuerySet
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.text import capfirst
 from django.urls import reverse
@@ -27,12 +33,19 @@ from django.utils.encoding import force_str
 from django.urls.exceptions import NoReverseMatch
 
 from .errors import APIException, ErrorMessage
+from .log_policy import count_exception, get_log_rule, sample
+from .mixins.db import SoftDeleteModelMixin
+from .ordering import reorder
+from .timing import get_server_timing
 
 L = logging.getLogger('app.' + __name__)
 
 first_cap_re = re.compile('(.)([A-Z][a-z]+)')
 all_cap_re = re.compile('([a-z0-9])([A-Z])')
 
+#: Culprit of each code object, see :func:`get_culprit`
+_culprits = {}
+
 
 def custom_exception_handler(exc, context):
     """
@@ -44,20 +57,28 @@ def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
     request = context.get('request')
 
-    # Getting originating location of exception
-    frm = inspect.trace()[-1]
-    mod = inspect.getmodule(frm[0])
-    func = traceback.extract_tb(sys.exc_info()[2])[-1][2]
-    log_extra = {'request': request, 'request_id': request.id,
-                 'culprit': "%s in %s" % (mod.__name__, func)}
-
     if response is None and settings.DEBUG:
         return response
 
-    if response:
-        L.warning(exc, extra=log_extra, exc_info=True)
+    rule = get_log_rule(exc, None if response is None else response.status_code)
+    # Every occurrence is counted, logged or not, see `ab_drf.log_policy`. When the level filters
+    # the record out the traceback isn't walked: it's counted under its type alone.
+    if L.isEnabledFor(rule.level):
+        culprit = get_culprit(exc)
+        logged = sample(rule)
     else:
-        L.exception(exc, extra=log_extra)
+        culprit, logged = None, False
+    occurrences, suppressed = count_exception(exc, culprit, logged)
+
+    if logged:
+        log_extra = {'request': request, 'request_id': getattr(request, 'id', None),
+                     'culprit': culprit, 'occurrences': occurrences,
+                     'suppressed': suppressed}
+        timing = get_server_timing(request)
+        if timing is not None:
+            log_extra['server_timing'] = timing.as_dict()
+
+        L.log(rule.level, exc, extra=log_extra, exc_info=rule.traceback)
 
     # Response is none, meaning builtin error handler failed to generate response and it needs to
     #  be converted to json response
@@ -76,6 +97,28 @@ def custom_exception_handler(exc, context):
     return response
 
 
+def get_culprit(exc=None):
+    """
+    Returns ``"<module> in <function>"`` for the innermost frame of the traceback of ``exc``,
+    or of the exception being handled. Unlike ``inspect.trace()`` it only walks the traceback
+    objects and never reads source files.
+    """
+    tb = getattr(exc, '__traceback__', None) or sys.exc_info()[2]
+    if tb is None:
+        return None
+
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+
+    code = tb.tb_frame.f_code
+    culprit = _culprits.get(code)
+    if culprit is None:
+        culprit = _culprits[code] = '%s in %s' % (
+            tb.tb_frame.f_globals.get('__name__'), code.co_name
+        )
+    return culprit
+
+
 def attachment_response(file, request, remove_file=True):
     filename = os.path.basename(file)
     with open(file, 'rb') as fp:
@@ -111,24 +154,28 @@ def attachment_response(file, request, remove_file=True):
 
 def update_order(order_data, model):
     """Parse json data and update model order.
-    Object keys should be: id, order"""
-    jsondata = json.loads(order_data)
-    for s in jsondata:
-        # This may occur if we have an empty placeholder, it's ok
-        if "id" not in s or s["id"] == "None":
-            continue
-        try:
-            instance = model.objects.get(pk=s["id"])
-            if instance.the_order != s["order"]:
-                instance.the_order = s["order"]
-                instance.save()
-        except model.DoesNotExist:
-            # Object may have been deleted, so just keep going
-            continue
+    Object keys should be: id, order
 
-def get_deleted_objects(objs):
-    """Based on `django/contrib/admin/utils.py`"""
-    collector = NestedObjects(using="default")
+    Returns the number of changed rows, see :func:`ab_drf.ordering.reorder`"""
+    return reorder(model, json.loads(order_data))
+
+
+def get_deleted_objects(objs, count_only=False, limit=None):
+    """
+    Based on `django/contrib/admin/utils.py`
+
+    With ``count_only``, only ``model_count`` is worked out, with ``COUNT`` queries following the
+    cascade (see :func:`count_deleted_objects`), and ``to_delete`` and ``protected`` are ``None``.
+
+    Reads from the database given by :func:`get_deletion_preview_database`.
+    """
+    using = get_deletion_preview_database(objs)
+    if count_only:
+        if limit is None:
+            raise ValueError("count_only needs a limit")
+        return None, count_deleted_objects(objs, limit, using=using), None
+
+    collector = NestedObjects(using=using)
     collector.collect(objs)
 
     def format_callback(obj):
@@ -157,6 +204,233 @@ def get_deleted_objects(objs):
 
     return to_delete, model_count, protected
 
+
+def get_deletion_preview_database(objs):
+    """
+    Database alias a deletion preview of ``objs`` (a queryset or a list of instances) reads from:
+    ``AB_DRF_DELETE_PREVIEW_DATABASE`` if set, such as a read replica, otherwise the alias of the
+    queryset or of the instances. A replica may lag behind, which is fine for a preview; the
+    deletion itself always runs on the objects' own database.
+    """
+    alias = getattr(settings, 'AB_DRF_DELETE_PREVIEW_DATABASE', None)
+    if alias:
+        return alias
+
+    if isinstance(objs, QuerySet):
+        return objs.db
+
+    state = getattr(next(iter(objs), None), '_state', None)
+    return getattr(state, 'db', None) or 'default'
+
+
+def get_cascade_relations(model):
+    """
+    Returns the reverse relations of ``model`` whose rows are deleted with it, as
+    ``(related model, field)`` pairs
+    """
+    return [
+        (relation.related_model, relation.field)
+        for relation in get_candidate_relations_to_delete(model._meta)
+        if relation.on_delete is CASCADE
+    ]
+
+
+def count_deleted_objects(objs, limit, using=None):
+    """
+    Counts what deleting ``objs`` (instances of a same model) cascades to, per
+    ``verbose_name_plural``, without loading any row: one ``COUNT`` query per cascading
+    relation, level after level. Objects reachable through several relations are counted once per
+    relation, and relations of ``on_delete`` handlers other than ``CASCADE`` (generic relations
+    included) are not followed.
+
+    Stops as soon as the total is over ``limit``, the counts are then incomplete. Queries run on
+    ``using``, the database of the objects by default.
+    """
+    objs = list(objs)
+    if not objs:
+        return {}
+
+    model = objs[0].__class__
+    using = using or objs[0]._state.db or "default"
+    queryset = model._base_manager.using(using).filter(pk__in=[obj.pk for obj in objs])
+
+    model_count = {}
+    # (model, queryset of the rows to delete, number of rows, field reached by)
+    pending = [(model, queryset, len(objs), None)]
+    total = 0
+    while pending:
+        model, queryset, count, reached_by = pending.pop(0)
+        name = model._meta.verbose_name_plural
+        model_count[name] = model_count.get(name, 0) + count
+        total += count
+        if total > limit:
+            break
+
+        # Multi-table inheritance: the parent rows go as well
+        for parent, ptr in model._meta.parents.items():
+            if ptr is not None:
+                parent_queryset = parent._base_manager.using(using).filter(
+                    pk__in=queryset.values(ptr.attname)
+                )
+                pending.append((parent, parent_queryset, count, ptr))
+
+        for related_model, field in get_cascade_relations(model):
+            if field is reached_by:
+                # Back to the child of a multi-table inheritance
+                continue
+
+            related_queryset = related_model._base_manager.using(using).filter(
+                **{"%s__in" % field.name: queryset}
+            ).order_by()
+            # Counting past the limit is pointless
+            related_count = related_queryset[:limit - total + 1].count()
+            if related_count:
+                pending.append((related_model, related_queryset, related_count, None))
+
+    return model_count
+
+
+class BatchDeleter:
+    """
+    Deletes an object and what it cascades to, leaf first, ``batch_size`` rows at a time, each
+    batch in its own transaction and followed by a ``pause`` (seconds), so no lock is held for
+    long. Defaults to the ``AB_DRF_DELETE_BATCH_SIZE`` (500) and ``AB_DRF_DELETE_BATCH_PAUSE``
+    (0) settings.
+
+    With a ``checkpoint_key``, progress is saved in the cache after every batch. Running again
+    with the same key skips the relations already emptied, and what was deleted is gone anyway,
+    so a retried task resumes where it stopped.
+
+    Relations are followed ``max_depth`` levels deep and a model already on the path (such as a
+    tree's parent) is not followed again: the ``QuerySet.delete()`` of those batches deletes the
+    rest of their cascade.
+    """
+
+    checkpoint_timeout = 24 * 60 * 60
+    max_depth = 8
+    #: Called with the number of deleted rows so far after every batch
+    on_progress = None
+
+    def __init__(self, obj, batch_size=None, pause=None, checkpoint_key=None):
+        if batch_size is None:
+            batch_size = getattr(settings, 'AB_DRF_DELETE_BATCH_SIZE', 500)
+        if pause is None:
+            pause = getattr(settings, 'AB_DRF_DELETE_BATCH_PAUSE', 0)
+
+        self.obj = obj
+        self.using = obj._state.db or 'default'
+        self.batch_size = batch_size
+        self.pause = pause
+        self.checkpoint_key = checkpoint_key
+        self.checkpoint = {'done': [], 'deleted': 0}
+        if checkpoint_key is not None:
+            self.checkpoint = cache.get(checkpoint_key) or self.checkpoint
+        self.done = set(self.checkpoint['done'])
+
+    def run(self):
+        """
+        Returns the number of deleted rows, including those of previous runs
+        """
+        model = self.obj.__class__
+        queryset = model._base_manager.using(self.using).filter(pk=self.obj.pk)
+        self.delete_related(model, queryset, '', (model,))
+
+        # Soft deletable objects go for good as well
+        delete = getattr(self.obj, 'hard_delete', self.obj.delete)
+        with transaction.atomic(using=self.using):
+            deleted, _ = delete()
+        self.checkpoint['deleted'] += deleted
+        if self.on_progress is not None:
+            self.on_progress(self.checkpoint['deleted'])
+
+        if self.checkpoint_key is not None:
+            cache.delete(self.checkpoint_key)
+        return self.checkpoint['deleted']
+
+    def delete_related(self, model, queryset, path, models):
+        for related_model, field in get_cascade_relations(model):
+            related_path = '%s/%s.%s' % (path, related_model._meta.label, field.name)
+            if related_path in self.done:
+                continue
+
+            related_queryset = related_model._base_manager.using(self.using).filter(
+                **{'%s__in' % field.name: queryset}
+            ).order_by()
+            if related_model not in models and len(models) < self.max_depth:
+                self.delete_related(
+                    related_model, related_queryset, related_path, models + (related_model,)
+                )
+            self.delete_queryset(related_queryset)
+
+            self.done.add(related_path)
+            self.checkpoint['done'].append(related_path)
+            self.save_checkpoint()
+
+    def delete_queryset(self, queryset):
+        manager = queryset.model._base_manager.using(self.using)
+        while True:
+            pks = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return
+
+            with transaction.atomic(using=self.using):
+                deleted, _ = manager.filter(pk__in=pks).delete()
+
+            self.checkpoint['deleted'] += deleted
+            self.save_checkpoint()
+            if self.on_progress is not None:
+                self.on_progress(self.checkpoint['deleted'])
+            if self.pause:
+                time.sleep(self.pause)
+
+    def save_checkpoint(self):
+        if self.checkpoint_key is not None:
+            cache.set(self.checkpoint_key, self.checkpoint, self.checkpoint_timeout)
+
+
+def in_purge_window(now=None):
+    """
+    Whether the local time is within ``AB_DRF_PURGE_HOURS``, ``(start hour, end hour)`` such as
+    ``(1, 5)`` or ``(22, 4)``. Always true when unset.
+    """
+    hours = getattr(settings, 'AB_DRF_PURGE_HOURS', None)
+    if not hours:
+        return True
+
+    start, end = hours
+    hour = timezone.localtime(now).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def purge_soft_deleted(now=None):
+    """
+    Deletes for good, with :class:`BatchDeleter`, the rows of
+    :class:`ab_drf.mixins.SoftDeleteModelMixin` models soft deleted more than
+    ``AB_DRF_SOFT_DELETE_RETENTION`` seconds ago (a day by default). At most
+    ``AB_DRF_PURGE_MAX_OBJECTS`` (1000) objects per model are purged per run, and only within
+    :func:`in_purge_window`. Returns the number of purged objects.
+    """
+    retention = getattr(settings, 'AB_DRF_SOFT_DELETE_RETENTION', 24 * 60 * 60)
+    max_objects = getattr(settings, 'AB_DRF_PURGE_MAX_OBJECTS', 1000)
+    deleted_before = (now or timezone.now()) - datetime.timedelta(seconds=retention)
+
+    purged = 0
+    for model in apps.get_models():
+        if not issubclass(model, SoftDeleteModelMixin):
+            continue
+
+        objs = model.all_objects.filter(deleted_at__lt=deleted_before).order_by('deleted_at')
+        for obj in objs[:max_objects]:
+            if not in_purge_window(now):
+                return purged
+            BatchDeleter(obj).run()
+            purged += 1
+
+    return purged
+
+
 def admin_urlname(value, arg, user=None):
     """Given model opts (model._meta) and a url name, return a named pattern.
     URLs should be named as: customadmin:app_label:model_name-list"""
@@ -0,0 +1,98 @@
+"""
+====
+Jobs
+====
+Status of the background tasks queued by :class:`ab_drf.mixins.OffloadViewSetMixin`, kept in
+the cache for ``AB_DRF_JOB_TIMEOUT`` seconds (a day by default) and served by
+:class:`ab_drf.views.JobStatusView`.
+
+The web processes and the workers must share the default cache (Redis, Memcached, the
+database...): with the per-process ``LocMemCache`` the API never sees what workers write, and
+jobs stay ``queued``.
+
+A job goes ``queued`` -> ``running`` -> ``done`` or ``failed``. Its task receives the
+``job_id`` keyword argument, runs under :func:`running_job` and may report progress with
+:func:`update_job`::
+
+    @task
+    def export(pk, job_id=None):
+        with running_job(job_id):
+            ...
+            update_job(job_id, progress={'rows': 1200})
+"""
+
+__all__ = ['QUEUED', 'RUNNING', 'DONE', 'FAILED', 'create_job', 'get_job', 'update_job',
+           'running_job']
+
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_KEY = 'ab_drf:job:%s'
+
+
+def get_job_timeout():
+    return getattr(settings, 'AB_DRF_JOB_TIMEOUT', 24 * 60 * 60)
+
+
+def create_job(name, user=None):
+    """
+    Stores a new ``queued`` job and returns it
+    """
+    job = {
+        'id': uuid.uuid4().hex,
+        'name': name,
+        'status': QUEUED,
+        'progress': None,
+        'error': None,
+        'user_id': getattr(user, 'pk', None),
+        'created_at': timezone.now().isoformat(),
+        'updated_at': None,
+    }
+    cache.set(JOB_KEY % job['id'], job, get_job_timeout())
+    return job
+
+
+def get_job(job_id):
+    return cache.get(JOB_KEY % job_id)
+
+
+def update_job(job_id, **fields):
+    """
+    Updates the fields (``status``, ``progress``, ``error``) of a job, if there is one.
+    Returns the job.
+    """
+    if job_id is None:
+        return None
+
+    job = get_job(job_id)
+    if job is None:
+        return None
+
+    job.update(fields, updated_at=timezone.now().isoformat())
+    cache.set(JOB_KEY % job_id, job, get_job_timeout())
+    return job
+
+
+@contextmanager
+def running_job(job_id):
+    """
+    Marks a job ``running``, then ``done``, or ``failed`` if the block raises
+    """
+    update_job(job_id, status=RUNNING)
+    try:
+        yield
+    except Exception as e:
+        # Only the type, the message may hold what the client shouldn't see
+        update_job(job_id, status=FAILED, error=e.__class__.__name__)
+        raise
+
+    update_job(job_id, status=DONE)
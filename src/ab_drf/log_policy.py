@@ -0,0 +1,140 @@
+"""
+==========
+Log policy
+==========
+Decides how :func:`ab_drf.helpers.custom_exception_handler` logs the exceptions handled by
+DRF (``ValidationError``, ``NotFound``, ``PermissionDenied``...), configured with
+``AB_DRF_EXCEPTION_LOG_POLICY``::
+
+    AB_DRF_EXCEPTION_LOG_POLICY = {
+        'ValidationError': {'level': 'INFO', 'traceback': False, 'sample_rate': 0.1},
+        'NotFound': {'log': False},
+        '4xx': {'traceback': False},
+        'default': {'level': 'WARNING', 'traceback': True},
+    }
+
+A rule is looked up by exception class name (base classes included), then status code
+(``404``), then status class (``'4xx'``) and finally ``'default'``. Keys missing from a rule
+are taken from the ``'default'`` rule. Without the setting every handled exception is logged
+as a warning with its traceback, as before. Exceptions DRF could not handle are always logged
+as errors with their traceback.
+
+Occurrences are counted per exception type and culprit whether they are logged or not. The
+next record logged for the same pair carries ``occurrences`` and ``suppressed`` (since the
+previous record) in its extra, and :func:`get_exception_counts` returns the totals.
+"""
+
+__all__ = ['LogRule', 'get_log_rule', 'sample', 'count_exception', 'get_exception_counts']
+
+import logging
+import random
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.signals import setting_changed
+
+LogRule = namedtuple('LogRule', ['log', 'level', 'traceback', 'sample_rate'])
+
+DEFAULT_RULE = {'log': True, 'level': logging.WARNING, 'traceback': True, 'sample_rate': 1.0}
+UNHANDLED_RULE = LogRule(True, logging.ERROR, True, 1.0)
+
+_rules = None
+_rule_cache = {}
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def compile_rule(rule):
+    level = rule['level']
+    if not isinstance(level, int):
+        level = logging.getLevelName(str(level).upper())
+        if not isinstance(level, int):
+            raise ImproperlyConfigured(
+                'AB_DRF_EXCEPTION_LOG_POLICY: unknown log level %r' % rule['level']
+            )
+
+    return LogRule(bool(rule['log']), level, bool(rule['traceback']), float(rule['sample_rate']))
+
+
+def get_rules():
+    global _rules
+
+    if _rules is None:
+        policy = getattr(settings, 'AB_DRF_EXCEPTION_LOG_POLICY', None) or {}
+        default = dict(DEFAULT_RULE, **policy.get('default', {}))
+        rules = {key: compile_rule(dict(default, **rule)) for key, rule in policy.items()}
+        rules['default'] = compile_rule(default)
+        _rules = rules
+    return _rules
+
+
+def get_log_rule(exc, status_code):
+    """
+    Returns the :class:`LogRule` of an exception handled with ``status_code``, ``None`` meaning
+    DRF couldn't handle it.
+    """
+    if status_code is None:
+        return UNHANDLED_RULE
+
+    key = (exc.__class__, status_code)
+    rule = _rule_cache.get(key)
+    if rule is None:
+        rules = get_rules()
+        candidates = [cls.__name__ for cls in exc.__class__.__mro__]
+        candidates += [status_code, str(status_code), '%dxx' % (status_code // 100), 'default']
+        rule = _rule_cache[key] = next(rules[name] for name in candidates if name in rules)
+    return rule
+
+
+def sample(rule):
+    """
+    Whether an exception covered by ``rule`` gets logged this time
+    """
+    return rule.log and (rule.sample_rate >= 1 or random.random() < rule.sample_rate)
+
+
+def count_exception(exc, culprit, logged):
+    """
+    Counts an occurrence. Returns the number of occurrences so far and, when ``logged``, the
+    number of occurrences suppressed since the previous record (``None`` otherwise).
+    """
+    key = (exc.__class__.__name__, culprit)
+    with _counts_lock:
+        counts = _counts.get(key)
+        if counts is None:
+            counts = _counts[key] = [0, 0]
+
+        counts[0] += 1
+        if not logged:
+            counts[1] += 1
+            return counts[0], None
+
+        suppressed, counts[1] = counts[1], 0
+        return counts[0], suppressed
+
+
+def get_exception_counts():
+    """
+    Returns ``{(exception class name, culprit): occurrences}`` of this process. Occurrences
+    filtered out by the logger level are counted with a ``None`` culprit.
+    """
+    with _counts_lock:
+        return {key: counts[0] for key, counts in _counts.items()}
+
+
+def reset_exception_counts():
+    with _counts_lock:
+        _counts.clear()
+
+
+def reload_log_policy(*args, **kwargs):
+    global _rules
+
+    if kwargs.get('setting') == 'AB_DRF_EXCEPTION_LOG_POLICY':
+        _rules = None
+        _rule_cache.clear()
+
+
+setting_changed.connect(reload_log_policy)
@@ -5,9 +5,17 @@ Middleware
 """
 import os
 import socket
+import time
 import uuid
+import zlib
+from contextlib import ExitStack
+from functools import lru_cache
 
-from django.utils import timezone
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from .timing import ServerTiming
 
 branch = os.environ.get('APP_BRANCH') or 'n/a'
 commit_hash = os.environ.get('APP_COMMIT_HASH') or 'n/a'
@@ -21,32 +29,181 @@ class HeadInfoMiddleware(object):
     * ``X-Request-Id``: UUID to identify the request
     * ``X-Version``: Git commit hash and branch name
     * ``X-Served-By``: Host name of the machine
+    * ``Server-Timing``: Duration of the request phases, when ``AB_DRF_SERVER_TIMING`` is on
+      (see :mod:`ab_drf.timing`)
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
         # One-time configuration and initialization.
+        self.server_timing = getattr(settings, 'AB_DRF_SERVER_TIMING', False)
+        self.version = '%s#%s' % (branch, commit_hash)
+        self.served_by = socket.gethostname()
 
     def __call__(self, request):
         # Code to be executed for each request before
         # the view (and later middleware) are called.
-        start_time = timezone.now()
-        request.id = uuid.uuid4().hex
+        start_time = time.perf_counter()
+        # A random (version 4) UUID, as hex
+        request.id = uuid.UUID(bytes=os.urandom(16), version=4).hex
 
-        response = self.get_response(request)
+        if self.server_timing:
+            response = self.get_timed_response(request)
+        else:
+            response = self.get_response(request)
 
         # Code to be executed for each request/response after
         # the view is called.
 
-        response['X-Runtime'] = (timezone.now() - start_time).total_seconds()
+        response['X-Runtime'] = '%.6f' % (time.perf_counter() - start_time)
         response['X-Request-Id'] = request.id
-        response['X-Version'] = '%s#%s' % (branch, commit_hash)
-        response['X-Served-By'] = socket.gethostname()
+        response['X-Version'] = self.version
+        response['X-Served-By'] = self.served_by
+        # `content` of a rendered response is its single buffer, joining it doesn't copy.
+        # Streaming and not yet rendered responses are left alone.
         if (
-            hasattr(response, 'content')
-            and not getattr(response, 'streaming', False)
-            and response.get('Content-Length') is None
+            not response.streaming
+            and getattr(response, 'is_rendered', True)
+            and not response.has_header('Content-Length')
         ):
             response['Content-Length'] = len(response.content)
 
         return response
+
+    def get_timed_response(self, request):
+        request.server_timing = timing = ServerTiming()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+
+        timing.add('total', time.perf_counter() - start)
+        response['Server-Timing'] = timing.header()
+        return response
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses responses with gzip or deflate, as negotiated with the ``Accept-Encoding``
+    request header.
+
+    * Bodies shorter than ``AB_DRF_COMPRESSION_MIN_LENGTH`` bytes (default: 200) are sent as is,
+      as are those with ``Cache-Control: no-transform``, and server errors (``5xx``) so a
+      failure while compressing can't hide the original one. Client errors, large validation
+      errors included, are compressed.
+    * Streaming responses are compressed as they go, without ``Content-Length``. The output is
+      flushed once ``AB_DRF_COMPRESSION_FLUSH_SIZE`` bytes (default: 16 KiB) came in since the
+      last flush, so clients get data steadily without a flush per (small) chunk costing the
+      compression ratio
+    * ``Content-Encoding``, ``Content-Length`` and ``Vary: Accept-Encoding`` are set accordingly
+
+    ``AB_DRF_COMPRESSION_LEVEL`` (default: 6) sets the zlib compression level.
+    """
+    # zlib `wbits` of each supported content coding, by order of preference
+    encodings = {
+        'gzip': 16 + zlib.MAX_WBITS,
+        'deflate': zlib.MAX_WBITS,
+    }
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_length = getattr(settings, 'AB_DRF_COMPRESSION_MIN_LENGTH', 200)
+        self.level = getattr(settings, 'AB_DRF_COMPRESSION_LEVEL', 6)
+        self.flush_size = getattr(settings, 'AB_DRF_COMPRESSION_FLUSH_SIZE', 16 * 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding') or response.status_code >= 500:
+            return response
+
+        cache_control = response.get('Cache-Control', '')
+        if 'no-transform' in (item.strip().lower() for item in cache_control.split(',')):
+            return response
+
+        if response.streaming:
+            content_length = response.get('Content-Length')
+            if content_length is not None and int(content_length) < self.min_length:
+                return response
+        elif len(response.content) < self.min_length:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''),
+                                      tuple(self.encodings))
+        if encoding is None:
+            return response
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.encodings[encoding])
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(response.streaming_content,
+                                                           compressor, self.flush_size)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            compressed = compressor.compress(response.content) + compressor.flush()
+            # Nothing to gain, eg. already compressed content
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+
+        return response
+
+
+def compress_sequence(sequence, compressor, flush_size):
+    pending = 0
+    for chunk in sequence:
+        if not chunk:
+            continue
+
+        compressed = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            # A sync flush ends on a byte boundary, so what came so far can be decoded
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+@lru_cache(maxsize=128)
+def negotiate_encoding(accept_encoding, supported):
+    """
+    Returns the content coding of ``supported`` with the highest ``q`` value in the
+    ``Accept-Encoding`` header, ``None`` if none is acceptable.
+    """
+    qvalues = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        qvalue = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        qvalues[coding] = qvalue
+
+    best, best_qvalue = None, 0.0
+    for coding in supported:
+        qvalue = qvalues.get(coding, qvalues.get('*', 0.0))
+        if qvalue > best_qvalue:
+            best, best_qvalue = coding, qvalue
+
+    return best
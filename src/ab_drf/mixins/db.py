@@ -1,7 +1,9 @@
-__all__ = ['AddUpdateTimeModelMixin', 'ViewPermModelMetaMixin']
+__all__ = ['AddUpdateTimeModelMixin', 'ViewPermModelMetaMixin', 'SoftDeleteModelMixin',
+           'SoftDeleteQuerySet', 'SoftDeleteManager']
 
 from django.db import models
 from django.db.models import Model
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 
@@ -21,3 +23,74 @@ class ViewPermModelMetaMixin:
     Adds view permission to a model along with other default permissions.
     """
     default_permissions = ('add', 'change', 'delete', 'view')
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Marks the rows deleted with a single ``UPDATE``. Returns ``(count, {label: count})``
+        like ``QuerySet.delete()``, the cascade aside.
+        """
+        count = self.update(deleted_at=timezone.now())
+        return count, {self.model._meta.label: count}
+
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        return super().delete()
+
+    hard_delete.queryset_only = True
+
+    def alive(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def dead(self):
+        return self.filter(deleted_at__isnull=False)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """
+    Hides soft deleted rows, unless ``alive_only`` is off
+    """
+
+    def __init__(self, alive_only=True):
+        super().__init__()
+        self.alive_only = alive_only
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.alive() if self.alive_only else queryset
+
+
+class SoftDeleteModelMixin(Model):
+    """
+    Opt-in soft delete, to combine with :class:`ab_drf.models.MyModel` or
+    :class:`AddUpdateTimeModelMixin`: ``delete()`` sets ``deleted_at`` with one ``UPDATE``,
+    whatever the size of the cascade, and ``objects`` hides deleted rows (``all_objects`` doesn't).
+
+    The rows and their cascade are deleted for good later by ``ab_drf.tasks.purge_soft_deleted``.
+    The base manager is left unfiltered, so the cascade of a hard delete, related object access
+    and the admin still see every row.
+    """
+    deleted_at = models.DateTimeField(_('Deleted at'), null=True, blank=True, editable=False,
+                                      db_index=True)
+
+    objects = SoftDeleteManager()
+    all_objects = SoftDeleteManager(alive_only=False)
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        self.deleted_at = timezone.now()
+        type(self)._base_manager.using(using or self._state.db).filter(pk=self.pk).update(
+            deleted_at=self.deleted_at
+        )
+        return 1, {self._meta.label: 1}
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using=using, keep_parents=keep_parents)
+
+    def restore(self):
+        self.deleted_at = None
+        type(self)._base_manager.using(self._state.db).filter(pk=self.pk).update(deleted_at=None)
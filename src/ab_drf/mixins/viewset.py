@@ -1,10 +1,23 @@
-__all__ = ['ActionSerializerViewSetMixin', 'NestedViewSetMixin']
+__all__ = ['ActionSerializerViewSetMixin', 'NestedViewSetMixin', 'StreamingListViewSetMixin',
+           'OffloadViewSetMixin', 'offload', 'ReorderViewSetMixin']
 
 from collections import deque
+from functools import partial, wraps
 
-from django.http import QueryDict
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import QueryDict, StreamingHttpResponse
+from django.urls import NoReverseMatch, reverse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework_extensions.mixins import NestedViewSetMixin as __NestedViewSetMixin
 
+from ..errors import APIException
+from ..jobs import FAILED, create_job, update_job
+from ..ordering import ORDER_FIELD, RebalanceInProgress, get_order_scope, move, reorder
+
 
 class ActionSerializerViewSetMixin:
     """
@@ -86,3 +99,232 @@ class NestedViewSetMixin(__NestedViewSetMixin):
             self.check_object_permissions(self.request, __parent_object)
 
         return parent_object
+
+
+class StreamingListViewSetMixin:
+    """
+    A view-set mixin that streams ``list()`` responses through the renderer's
+    ``render_stream()`` (see :class:`ab_drf.renderer.CustomRenderer`).
+
+    Rows are serialized lazily while the response is being written, so neither the
+    serialized page nor the encoded body is held in memory as a whole. The output is
+    byte-identical to the regular response. It falls back to the regular response when the
+    negotiated renderer can't stream (eg. browsable API), and for the items of a
+    :class:`ab_drf.views.BatchView`, which reads their ``data``.
+
+    Usage:
+
+        class ExportViewSet(StreamingListViewSetMixin, MyListViewSet):
+            ...
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not self.can_stream(request, request.accepted_renderer):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.iter_serialized_rows(page))
+
+        # `iterator()` skips the queryset cache, but it can't be used with prefetching
+        if hasattr(queryset, 'iterator') and not getattr(
+            queryset, '_prefetch_related_lookups', None
+        ):
+            queryset = queryset.iterator()
+
+        return Response(self.iter_serialized_rows(queryset))
+
+    @staticmethod
+    def can_stream(request, renderer):
+        return hasattr(renderer, 'render_stream') and not getattr(request, 'batch_item', False)
+
+    def iter_serialized_rows(self, objects):
+        child = self.get_serializer(objects, many=True).child
+        return (child.to_representation(obj) for obj in objects)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        renderer = getattr(response, 'accepted_renderer', None)
+
+        if (
+            self.action != 'list'
+            or response.status_code != status.HTTP_200_OK
+            or not self.can_stream(request, renderer)
+        ):
+            return response
+
+        # `Response.rendered_content` adds itself to the context the same way
+        renderer_context = dict(response.renderer_context, response=response)
+        streaming_response = StreamingHttpResponse(
+            renderer.render_stream(response.data, response.accepted_media_type, renderer_context),
+            status=response.status_code,
+            content_type=response.content_type or renderer.media_type,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming_response[header] = value
+
+        return streaming_response
+
+
+class OffloadViewSetMixin:
+    """
+    Runs expensive calls inline when they're cheap enough, otherwise queues them as a task and
+    answers ``202 Accepted`` with a job (see :mod:`ab_drf.jobs`) the client can poll::
+
+        {"job_id": "...", "status": "queued", "status_url": "https://.../jobs/..."}
+
+    Calls costing more than ``offload_threshold`` are offloaded. ``status_url`` is given when
+    ``job_status_url_name`` (the URL name of :class:`ab_drf.views.JobStatusView`) resolves.
+    """
+
+    offload_threshold = 100
+    job_status_url_name = 'job-status'
+
+    def should_offload(self, cost, threshold=None):
+        return cost > (self.offload_threshold if threshold is None else threshold)
+
+    def offload(self, task, *args, **kwargs):
+        """
+        Queues ``task`` with ``args``, ``kwargs`` and a ``job_id``, returns the ``202`` response.
+        The job is marked ``failed`` if it can't be queued.
+        """
+        name = getattr(task, 'name', None) or task.__name__
+        job = create_job(name, getattr(self.request, 'user', None))
+        try:
+            task.delay(*args, job_id=job['id'], **kwargs)
+        except Exception as e:
+            update_job(job['id'], status=FAILED, error=e.__class__.__name__)
+            raise
+        return Response(self.get_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+    def get_job_data(self, job):
+        data = {'job_id': job['id'], 'status': job['status']}
+        try:
+            data['status_url'] = self.request.build_absolute_uri(
+                reverse(self.job_status_url_name, kwargs={'job_id': job['id']})
+            )
+        except NoReverseMatch:
+            pass
+        return data
+
+
+def offload(estimate, task, threshold=None):
+    """
+    Decorates an action of a view-set with :class:`OffloadViewSetMixin`.
+    ``estimate(view, request, *args, **kwargs)`` returns the cost of the call and the positional
+    arguments of ``task``; past the threshold the task is queued instead of running the action::
+
+        @action(detail=True, methods=['post'])
+        @offload(lambda view, request, pk: (view.get_object().lines.count(), [pk]), export_task)
+        def action_export(self, request, pk):
+            ...
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            cost, task_args = estimate(self, request, *args, **kwargs)
+            if self.should_offload(cost, threshold):
+                return self.offload(task, *task_args)
+            return func(self, request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ReorderViewSetMixin:
+    """
+    Adds a ``POST .../actions/reorder`` endpoint setting ``the_order`` of many objects at once
+    (see :func:`ab_drf.ordering.reorder`), among those the user can see and passing the object
+    permissions::
+
+        [{"id": 3, "order": 1}, {"id": 1, "order": 2}]
+
+    Answers with the number of changed rows: ``{"changed": 2}``
+
+    ``POST .../{pk}/actions/move`` puts one object between two others, ``null`` meaning the
+    start or the end of the list, writing its row alone (see :func:`ab_drf.ordering.move`)::
+
+        {"before": 3, "after": 8}
+
+    A list is the objects sharing ``order_scope_fields`` (the whole table by default). When
+    the keys of a long list left no room, its following rows are shifted and its keys are spread
+    again by a background task. While that runs, the list answers ``409 Conflict``.
+    """
+
+    order_scope_fields = ()
+
+    @action(detail=False, methods=['post'])
+    def action_reorder(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValidationError(['Expected a list of {"id": ..., "order": ...} items.'])
+        if any('id' in item and 'order' not in item for item in items):
+            raise ValidationError(['Each item needs an "order".'])
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Any object the user may not change rejects the whole set, before anything is written
+        try:
+            changed = reorder(queryset.model, items, queryset=queryset,
+                              check=partial(self.check_object_permissions, request),
+                              scope_fields=self.order_scope_fields)
+        except ValueError as e:
+            raise ValidationError([str(e)])
+        except RebalanceInProgress:
+            raise self.rebalance_conflict()
+        return Response({'changed': changed})
+
+    @action(detail=True, methods=['post'])
+    def action_move(self, request, *args, **kwargs):
+        instance = self.get_object()
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if not isinstance(request.data, dict):
+            raise ValidationError(['Expected {"before": ..., "after": ...}.'])
+
+        neighbours = {}
+        for name in ('before', 'after'):
+            pk = request.data.get(name)
+            if pk is None:
+                neighbours[name] = None
+                continue
+            try:
+                neighbour = queryset.filter(pk=pk).first()
+            except (TypeError, ValueError, DjangoValidationError):
+                neighbour = None
+            if neighbour is None:
+                raise ValidationError({name: ['Not found.']})
+            if neighbour.pk == instance.pk:
+                raise ValidationError({name: ['Cannot be the moved object.']})
+            neighbours[name] = neighbour
+
+        if neighbours['before'] is None and neighbours['after'] is None:
+            raise ValidationError(['Expected "before" or "after".'])
+
+        try:
+            shifted = move(instance, scope_fields=self.order_scope_fields, **neighbours)
+        except ValueError as e:
+            raise ValidationError([str(e)])
+        except queryset.model.DoesNotExist:
+            raise ValidationError(['A neighbour was deleted.'])
+        except RebalanceInProgress:
+            raise self.rebalance_conflict()
+
+        if shifted:
+            self.schedule_rebalance(queryset.model,
+                                    get_order_scope(instance, self.order_scope_fields))
+        return Response({'id': instance.pk, 'order': getattr(instance, ORDER_FIELD)})
+
+    def rebalance_conflict(self):
+        return APIException('The list is being reordered, try again later.',
+                            status_code=status.HTTP_409_CONFLICT)
+
+    def schedule_rebalance(self, model, scope):
+        # Late import: tasks depend on the helpers, which depend on these mixins
+        from ..tasks import rebalance_order
+
+        rebalance_order.delay(ContentType.objects.get_for_model(model).id, scope)
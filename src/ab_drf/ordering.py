@@ -0,0 +1,394 @@
+"""
+========
+Ordering
+========
+Helpers for models sorted by a ``the_order`` field.
+
+:func:`reorder` sets the order of many objects at once. :func:`move` puts one object between
+two others by writing that row alone: keys are spread ``AB_DRF_ORDER_GAP`` (1024) apart, leaving
+room for about ten moves into the same spot before the keys of the list have to be spread again
+by :func:`rebalance`.
+
+A list is the rows sharing the values of some scope fields (a parent foreign key, say), given
+as a ``scope`` dict of attribute names to values (see :func:`get_order_scope`); no scope makes
+the whole table one list. Keys are only compared, shifted and spread within a list.
+
+Lists holding dense keys (``0, 1, 2...``, as written by :func:`reorder`) are spread by the
+first move needing room in them. Large tables may rather be spread at once, from a data
+migration for instance, with :func:`rebalance_lists`.
+
+While :func:`rebalance` runs, the list is locked against moves and reorders in the cache named
+by ``AB_DRF_ORDER_LOCK_CACHE`` (``default``), which the web processes and the workers must
+share: rebalancing with a ``LocMemCache`` or ``DummyCache`` raises ``ImproperlyConfigured``,
+unless ``DEBUG``.
+"""
+
+__all__ = ['RebalanceInProgress', 'get_order_scope', 'get_max_order', 'reorder',
+           'get_order_between', 'move', 'rebalance', 'rebalance_lists']
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connections, transaction
+from django.db.models import F, Max, Q
+
+ORDER_FIELD = 'the_order'
+
+REBALANCE_LOCK_KEY = 'ab_drf:order:rebalance:%s:%s'
+
+
+class RebalanceInProgress(Exception):
+    """The keys of the list are being spread, it can't be reordered meanwhile"""
+
+
+def get_order_gap():
+    return getattr(settings, 'AB_DRF_ORDER_GAP', 1024)
+
+
+def get_inline_rebalance_limit():
+    return getattr(settings, 'AB_DRF_ORDER_INLINE_REBALANCE', 1000)
+
+
+def get_reorder_spread():
+    return getattr(settings, 'AB_DRF_REORDER_SPREAD', False)
+
+
+def get_rebalance_lock_timeout():
+    return getattr(settings, 'AB_DRF_ORDER_REBALANCE_TIMEOUT', 60 * 60)
+
+
+def get_scope_attnames(model, scope_fields):
+    return [model._meta.get_field(name).attname for name in scope_fields]
+
+
+def get_order_scope(instance, scope_fields=()):
+    """
+    Returns the scope of the list holding ``instance``: ``{attname: value}`` of ``scope_fields``
+    """
+    return {attname: getattr(instance, attname)
+            for attname in get_scope_attnames(instance.__class__, scope_fields)}
+
+
+def get_max_order(model, using=None):
+    """
+    Returns the largest key ``the_order`` of ``model`` holds, from the range of its integer
+    type, or ``None`` if it isn't bounded. The range is the portable one, even where the
+    backend (SQLite) stores larger numbers.
+    """
+    field = model._meta.get_field(ORDER_FIELD)
+    ops = connections[using or 'default'].ops
+    return ops.integer_field_ranges.get(field.get_internal_type(), (None, None))[1]
+
+
+def get_rebalance_lock_key(model, scope):
+    scope = ','.join('%s=%s' % item for item in sorted((scope or {}).items()))
+    return REBALANCE_LOCK_KEY % (model._meta.label_lower, scope)
+
+
+def get_lock_cache_alias():
+    return getattr(settings, 'AB_DRF_ORDER_LOCK_CACHE', 'default')
+
+
+def check_not_rebalancing(model, scope):
+    if caches[get_lock_cache_alias()].get(get_rebalance_lock_key(model, scope)) is not None:
+        raise RebalanceInProgress('The list is being rebalanced')
+
+
+@contextmanager
+def rebalancing(model, scope):
+    """
+    Holds the rebalance lock of a list, in the cache, raising :class:`RebalanceInProgress` if
+    it's taken: keys moved between two batches of :func:`rebalance` could end up out of order.
+    Raises ``ImproperlyConfigured`` if the cache isn't shared between processes.
+    """
+    alias = get_lock_cache_alias()
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)) and not settings.DEBUG:
+        raise ImproperlyConfigured(
+            'The "%s" cache is not shared between processes, it cannot hold the rebalance '
+            'locks: set AB_DRF_ORDER_LOCK_CACHE to a shared cache.' % alias
+        )
+    key = get_rebalance_lock_key(model, scope)
+    if not cache.add(key, True, get_rebalance_lock_timeout()):
+        raise RebalanceInProgress('The list is already being rebalanced')
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def reorder(model, items, queryset=None, batch_size=500, check=None, scope_fields=()):
+    """
+    Sets the order of many objects at once. ``items`` are ``{"id": ..., "order": ...}`` dicts;
+    those without an id (placeholders) or whose object is gone are skipped. The orders are
+    written as given, or times ``AB_DRF_ORDER_GAP`` with ``AB_DRF_REORDER_SPREAD``, leaving
+    room for :func:`move` (clients then read the stored keys, not their orders, back).
+
+    Rows are fetched with one ``in_bulk()`` query on ``queryset`` (every object of ``model`` by
+    default) and only those whose key changed are written, with ``bulk_update()``, in one
+    transaction. ``check`` is called with every fetched object before anything is written, and
+    may raise to reject the whole set. Returns the number of changed rows.
+
+    Raises ``ValueError`` if a key would go past :func:`get_max_order`, and
+    :class:`RebalanceInProgress` if a list of the objects, by ``scope_fields``, is being spread.
+    """
+    pk_field = model._meta.pk
+    order_field = model._meta.get_field(ORDER_FIELD)
+    gap = get_order_gap() if get_reorder_spread() else 1
+
+    orders = {}
+    for item in items:
+        # This may occur if we have an empty placeholder, it's ok
+        if 'id' not in item or item['id'] == 'None':
+            continue
+        try:
+            orders[pk_field.to_python(item['id'])] = order_field.to_python(item['order']) * gap
+        except ValidationError:
+            continue
+
+    if not orders:
+        return 0
+
+    if queryset is None:
+        queryset = model._default_manager.all()
+
+    maximum = get_max_order(model, queryset.db)
+    if maximum is not None and max(orders.values()) > maximum:
+        raise ValueError('An order is out of range.')
+
+    with transaction.atomic(using=queryset.db):
+        instances = queryset.in_bulk(list(orders))
+        if check is not None:
+            for instance in instances.values():
+                check(instance)
+        scopes = {tuple(get_order_scope(instance, scope_fields).items())
+                  for instance in instances.values()}
+        for scope in scopes:
+            check_not_rebalancing(model, dict(scope))
+
+        changed = []
+        for pk, instance in instances.items():
+            if getattr(instance, ORDER_FIELD) != orders[pk]:
+                setattr(instance, ORDER_FIELD, orders[pk])
+                changed.append(instance)
+
+        if changed:
+            queryset.model._base_manager.using(queryset.db).bulk_update(
+                changed, [ORDER_FIELD], batch_size=batch_size
+            )
+
+    return len(changed)
+
+
+def get_order_between(before, after, gap=None, maximum=None):
+    """
+    Returns a key strictly between ``before`` and ``after``, ``None`` meaning the start or the
+    end of the list, or ``None`` if there is no room left. Keys are never negative, nor larger
+    than ``maximum``.
+
+        >>> get_order_between(1024, 2048)
+        1536
+        >>> get_order_between(2048, None)
+        3072
+        >>> get_order_between(3, 4) is None
+        True
+    """
+    if gap is None:
+        gap = get_order_gap()
+
+    if before is None and after is None:
+        return gap
+    if after is None:
+        if maximum is None or before + gap <= maximum:
+            return before + gap
+        after = maximum + 1
+    if before is None:
+        if after - gap >= 0:
+            return after - gap
+        before = -1
+
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def move(instance, before=None, after=None, scope_fields=(), using=None):
+    """
+    Moves ``instance`` between the objects ``before`` and ``after`` (either may be ``None``, at
+    the start or the end of the list), which should be next to each other in its list, the rows
+    sharing its ``scope_fields`` and sorted by key then pk. The three rows are locked while
+    their keys are read.
+
+    When there's room between their keys only the row of ``instance`` is written. Otherwise a
+    list of up to ``AB_DRF_ORDER_INLINE_REBALANCE`` (1000) rows is spread at once; in a longer
+    one the following rows are shifted by the gap, with one ``UPDATE``, to make some. Returns
+    whether rows were shifted, meaning the list should be spread with :func:`rebalance`.
+
+    Raises ``ValueError`` if the neighbours are in the wrong order, not next to each other or in
+    another list, ``DoesNotExist`` if a row is gone and :class:`RebalanceInProgress`.
+    """
+    if before is None and after is None:
+        raise ValueError('Expected "before" or "after".')
+
+    model = instance.__class__
+    manager = model._base_manager.db_manager(using or instance._state.db)
+    attnames = get_scope_attnames(model, scope_fields)
+    gap = get_order_gap()
+    maximum = get_max_order(model, manager.db)
+
+    with transaction.atomic(using=manager.db):
+        # The current keys and lists, they may have changed since the rows were loaded
+        pks = {row.pk for row in (instance, before, after) if row is not None}
+        rows = manager.select_for_update().filter(pk__in=pks)
+        rows = {row[0]: row[1:] for row in rows.values_list('pk', ORDER_FIELD, *attnames)}
+        if len(rows) != len(pks):
+            raise model.DoesNotExist('A row is gone')
+        if len({row[1:] for row in rows.values()}) > 1:
+            raise ValueError('"before" and "after" should be in the same list.')
+
+        scope = dict(zip(attnames, rows[instance.pk][1:]))
+        check_not_rebalancing(model, scope)
+        in_list = manager.filter(**scope)
+
+        def get_order():
+            low = rows[before.pk][0] if before is not None else None
+            high = rows[after.pk][0] if after is not None else None
+            if low is not None and high is not None and low >= high:
+                raise ValueError('"before" should come before "after".')
+            return low, high, get_order_between(low, high, gap, maximum)
+
+        low, high, order = get_order()
+        if in_list.filter(get_rows_between(before, after, low, high)).exclude(
+                pk=instance.pk).exists():
+            raise ValueError('"before" and "after" should be next to each other.')
+
+        shifted = False
+        if order is None:
+            largest = in_list.aggregate(largest=Max(ORDER_FIELD))['largest']
+            can_shift = high is not None and (maximum is None or largest + gap <= maximum)
+            if can_shift and in_list.count() > get_inline_rebalance_limit():
+                in_list.filter(**{'%s__gte' % ORDER_FIELD: high}).exclude(pk=instance.pk).update(
+                    **{ORDER_FIELD: F(ORDER_FIELD) + gap}
+                )
+                order = get_order_between(low, high + gap, gap, maximum)
+                shifted = True
+            else:
+                # A short list, one never spread (dense keys) most likely, or one whose
+                # keys can't be shifted further
+                spread(in_list, 500)
+                rows.update({row[0]: row[1:] for row in in_list.filter(pk__in=pks).values_list(
+                    'pk', ORDER_FIELD, *attnames)})
+                low, high, order = get_order()
+                if order is None:
+                    raise ValueError('There is no room left in the list.')
+
+        manager.filter(pk=instance.pk).update(**{ORDER_FIELD: order})
+
+    setattr(instance, ORDER_FIELD, order)
+    return shifted
+
+
+def get_rows_between(before, after, low, high):
+    """
+    Condition matching the rows sorted between ``before`` and ``after``, of keys ``low`` and
+    ``high``, ties on the key being broken by the pk
+    """
+    condition = Q()
+    if before is not None:
+        condition &= (Q(**{'%s__gt' % ORDER_FIELD: low})
+                      | Q(**{ORDER_FIELD: low, 'pk__gt': before.pk}))
+    if after is not None:
+        condition &= (Q(**{'%s__lt' % ORDER_FIELD: high})
+                      | Q(**{ORDER_FIELD: high, 'pk__lt': after.pk}))
+    return condition
+
+
+def rebalance(model, scope=None, batch_size=500, using=None):
+    """
+    Spreads the keys of a list of ``model`` rows, ``scope`` being ``{attname: value}`` (the
+    whole table without one), ``AB_DRF_ORDER_GAP`` apart, keeping their order, and writes the
+    rows whose key changed. The gap shrinks when the list would go past :func:`get_max_order`.
+
+    Rows are read and written ``batch_size`` at a time, each batch in its own transaction,
+    while the list is locked against :func:`move` and :func:`reorder`. Returns the number of
+    changed rows; raises :class:`RebalanceInProgress` if the list is being spread already.
+    """
+    scope = scope or {}
+    with rebalancing(model, scope):
+        return spread(model._base_manager.db_manager(using).filter(**scope), batch_size)
+
+
+def rebalance_lists(model, scope_fields=(), batch_size=500, using=None):
+    """
+    Spreads the keys of every list of ``model``, see :func:`rebalance`, for instance to give
+    dense keys gaps once from a data migration. Returns the number of changed rows.
+    """
+    manager = model._base_manager.db_manager(using)
+    attnames = get_scope_attnames(model, scope_fields)
+    if not attnames:
+        return rebalance(model, batch_size=batch_size, using=using)
+
+    changed = 0
+    for values in manager.order_by().values_list(*attnames).distinct().iterator():
+        changed += rebalance(model, dict(zip(attnames, values)), batch_size, using)
+    return changed
+
+
+def spread(rows, batch_size):
+    """
+    Writes the keys of ``rows`` ``AB_DRF_ORDER_GAP`` apart. Keys going down are written first,
+    walking up the list, then those going up, walking down: each new key lies between the
+    current ones of its neighbours, so the order holds between the batches.
+    """
+    count = rows.count()
+    if not count:
+        return 0
+
+    gap = get_order_gap()
+    maximum = get_max_order(rows.model, rows.db)
+    if maximum is not None and count * gap > maximum:
+        gap = maximum // count
+        if not gap:
+            raise ValueError('The list is too long for %s' % ORDER_FIELD)
+
+    changed = write_spread_keys(rows, gap, count, batch_size, descending=False)
+    return changed + write_spread_keys(rows, gap, count, batch_size, descending=True)
+
+
+def write_spread_keys(rows, gap, count, batch_size, descending):
+    manager = rows.model._base_manager.using(rows.db)
+    if descending:
+        rows = rows.order_by('-%s' % ORDER_FIELD, '-pk')
+        step, position, lookup = -1, count + 1, 'lt'
+    else:
+        rows = rows.order_by(ORDER_FIELD, 'pk')
+        step, position, lookup = 1, 0, 'gt'
+
+    changed = 0
+    last = None
+    while True:
+        with transaction.atomic(using=rows.db):
+            batch = rows.select_for_update()
+            if last is not None:
+                # Keyset on the keys as read, the rows written went behind them
+                order, pk = last
+                batch = batch.filter(Q(**{'%s__%s' % (ORDER_FIELD, lookup): order})
+                                     | Q(**{ORDER_FIELD: order, 'pk__%s' % lookup: pk}))
+            batch = list(batch.values_list(ORDER_FIELD, 'pk')[:batch_size])
+
+            keys = []
+            for order, pk in batch:
+                position += step
+                key = position * gap
+                if (key > order) if descending else (key < order):
+                    keys.append(rows.model(pk=pk, **{ORDER_FIELD: key}))
+            manager.bulk_update(keys, [ORDER_FIELD])
+
+        changed += len(keys)
+        if len(batch) < batch_size:
+            return changed
+        last = batch[-1]
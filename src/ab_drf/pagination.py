@@ -2,21 +2,231 @@
 Pagination
 ==========
 """
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured, ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import BooleanField, F, Func, Q, Value
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+PAGE_PLACEHOLDER = '__page__'
+
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATED = 'estimated'
+
+#: Backends comparing row values, ``(a, b) < (x, y)``, with an index range scan
+ROW_COMPARISON_VENDORS = ('postgresql', 'sqlite')
+
+
+class RowComparison(Func):
+    """
+    ``(a, b) < (x, y)``: compares the ``columns`` with the ``values``, given with the fields they
+    are converted by
+    """
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, columns, values, fields, operator):
+        self.operator = operator
+        values = [Value(value, output_field=field) for value, field in zip(values, fields)]
+        super().__init__(*[F(column) for column in columns], *values)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sqls = []
+        params = []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sqls.append(sql)
+            params.extend(expression_params)
+
+        half = len(sqls) // 2
+        sql = '(%s) %s (%s)' % (', '.join(sqls[:half]), self.operator, ', '.join(sqls[half:]))
+        return sql, params
+
+
+class CountStrategyPaginator(DjangoPaginator):
+    """
+    Django paginator that can avoid running an exact ``COUNT(*)`` on every page request.
+
+    * ``exact``: plain ``COUNT(*)``, as Django does.
+    * ``cached``: the exact count is cached for ``count_cache_timeout`` seconds, keyed by the
+      SQL and params of the (unordered) queryset. A count served from the cache is flagged as
+      approximate since it may be stale.
+    * ``estimated``: the row estimate from the database planner statistics (PostgreSQL and
+      MySQL) when the queryset isn't filtered; exact count otherwise.
+
+    Approximate counts don't clip the last page, a page beyond the estimate is just empty.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 count_strategy=COUNT_EXACT, count_cache_timeout=60):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.count_strategy = count_strategy
+        self.count_cache_timeout = count_cache_timeout
+        self._count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+
+        if self.count_strategy == COUNT_ESTIMATED:
+            count = self.get_estimated_count()
+            if count is not None:
+                self._count_is_approximate = True
+                return count
+
+        elif self.count_strategy == COUNT_CACHED:
+            key = self.get_count_cache_key()
+            count = cache.get(key) if key is not None else None
+            if count is not None:
+                self._count_is_approximate = True
+                return count
+
+            count = super().count
+            if key is not None:
+                cache.set(key, count, self.count_cache_timeout)
+            return count
+
+        return super().count
+
+    def get_count_cache_key(self):
+        queryset = self.object_list.order_by()
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+
+        digest = hashlib.md5(('%s|%s|%r' % (queryset.db, sql, params)).encode()).hexdigest()
+        return 'ab_drf:count:%s' % digest
+
+    def get_estimated_count(self):
+        """
+        Returns the planner's row estimate of the table, ``None`` if the queryset is
+        filtered or the database doesn't keep such statistics.
+        """
+        queryset = self.object_list
+        query = queryset.query
+        if (
+            query.where
+            or query.distinct
+            or query.combinator
+            or query.group_by is not None
+            or query.low_mark
+            or query.high_mark is not None
+        ):
+            return None
+
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+            params = [connection.ops.quote_name(table)]
+        elif connection.vendor == 'mysql':
+            sql = ('SELECT table_rows FROM information_schema.tables '
+                   'WHERE table_schema = DATABASE() AND table_name = %s')
+            params = [table]
+        else:
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+
+        # PostgreSQL reports -1 for tables that were never analyzed
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+    @property
+    def count_is_approximate(self):
+        return self.count is not None and self._count_is_approximate
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+
+        # The estimate can't tell whether a page is past the end, only check it's valid
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if not self.count_is_approximate:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
 
 
 class CustomPagination(pagination.PageNumberPagination):
     page_size = 9
+    #: One of ``'exact'``, ``'cached'`` or ``'estimated'``, see :class:`CountStrategyPaginator`
+    count_strategy = COUNT_EXACT
+    count_cache_timeout = 60
+    #: Number of page links returned around the current page
+    page_links_window = 5
+    #: Clients that don't show page links can skip them with ``?page_links=false``
+    page_links_query_param = 'page_links'
+
+    def django_paginator_class(self, object_list, per_page):
+        # DRF instantiates `self.django_paginator_class(queryset, page_size)`
+        return CountStrategyPaginator(
+            object_list, per_page,
+            count_strategy=self.count_strategy,
+            count_cache_timeout=self.count_cache_timeout,
+        )
 
     def get_page_links(self):
-        page_links = self.get_html_context()["page_links"]
+        """
+        Links to the ``page_links_window`` pages around the current one. The URLs are derived
+        from a single query string template instead of DRF's browsable API page links.
+        """
+        if not self.include_page_links():
+            return []
+
+        number = self.page.number
+        num_pages = self.page.paginator.num_pages
+        start = max(1, min(number - self.page_links_window // 2,
+                           num_pages - self.page_links_window + 1))
+        end = min(num_pages, start + self.page_links_window - 1)
+
+        url = self.request.build_absolute_uri()
+        first_page_url = remove_query_param(url, self.page_query_param)
+        url_template = replace_query_param(url, self.page_query_param, PAGE_PLACEHOLDER)
+
         return [
-            {"number": pl.number, "url": pl.url, "is_active": pl.is_active}
-            for pl in page_links
+            {
+                "number": page_number,
+                "url": first_page_url if page_number == 1
+                else url_template.replace(PAGE_PLACEHOLDER, str(page_number)),
+                "is_active": page_number == number,
+            }
+            for page_number in range(start, end + 1)
         ]
 
+    def include_page_links(self):
+        value = self.request.query_params.get(self.page_links_query_param)
+        return value is None or value.lower() not in ('0', 'false', 'no', 'off')
+
     def get_paginated_response(self, data):
         return Response(
             {
@@ -36,6 +246,163 @@ class CustomPagination(pagination.PageNumberPagination):
                 "start_index": self.page.start_index(),
                 "end_index": self.page.end_index(),
                 "count": self.page.paginator.count,
+                "count_is_approximate": self.page.paginator.count_is_approximate,
+                "results": data,
+            }
+        )
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    Keyset (seek) pagination that returns the ``links/results`` shape of
+    :class:`CustomPagination`, along with top-level ``next``/``previous`` cursor URLs, which
+    :class:`ab_drf.renderer.CustomRenderer` puts in the envelope. ``count`` is always ``null``.
+
+    Unlike DRF's ``CursorPagination`` the cursor holds the values of *every* ordering field,
+    so pages are fetched with a seek on the index whatever the page depth: no ``OFFSET`` and no
+    ``COUNT(*)``. When the fields are all sorted the same way the seek is a row comparison,
+    ``WHERE (created_at, id) < (...)``, on PostgreSQL and SQLite, and otherwise
+    ``created_at <= ... AND (created_at < ... OR id < ...)`` (see :meth:`get_seek_filter`).
+
+    The ordering fields should be backed by an index and the last one should be unique (eg.
+    ``('-created_at', '-id')`` on ``AddUpdateTimeModelMixin`` models). They must not be
+    nullable, ``NULL`` can't be compared in the seek: ``ImproperlyConfigured`` is raised
+    otherwise. The ordering can be overridden per view with ``keyset_ordering``.
+    """
+    page_size = CustomPagination.page_size
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering is not None:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [self._get_field(queryset.model, item) for item in self.ordering]
+        nullable = [field.name for field in self.fields if field.null]
+        if nullable:
+            raise ImproperlyConfigured(
+                'KeysetPagination cannot order by nullable fields (%s) of %s, set '
+                '`keyset_ordering` on the view.' % (', '.join(nullable), queryset.model.__name__)
+            )
+
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            ordering = [item[1:] if item.startswith('-') else '-' + item
+                        for item in self.ordering]
+        else:
+            ordering = self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            vendor = connections[queryset.db].vendor
+            queryset = queryset.filter(self.get_seek_filter(position, reverse, vendor))
+
+        # One extra row tells whether there's a page after this one
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_seek_filter(self, position, reverse=False, vendor=None):
+        """
+        Lexicographic "comes after ``position``" condition over the ordering fields. A row
+        comparison, ``(a, b) > (x, y)``, when the fields are sorted the same way and the
+        ``vendor`` supports it, otherwise ``a >= x AND (a > x OR (b >= y AND (b > y OR ...)))``,
+        whose leading bound the planner can use as an index range.
+        """
+        items = list(zip(self.ordering, self.fields, position))
+        descending = [item.startswith('-') != reverse for item, _, _ in items]
+
+        if vendor in ROW_COMPARISON_VENDORS and len(set(descending)) == 1 and len(items) > 1:
+            return RowComparison(
+                [field.attname for _, field, _ in items], [value for _, _, value in items],
+                [field for _, field, _ in items], '<' if descending[0] else '>',
+            )
+
+        # Built from the last field backwards
+        seek = None
+        for (item, field, value), desc in reversed(list(zip(items, descending))):
+            after = Q(**{'%s__%s' % (field.attname, 'lt' if desc else 'gt'): value})
+            if seek is None:
+                seek = after
+            else:
+                bound = Q(**{'%s__%s' % (field.attname, 'lte' if desc else 'gte'): value})
+                seek = bound & (after | seek)
+        return seek
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._get_position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse=False):
+        tokens = {'p': position}
+        if reverse:
+            tokens['r'] = 1
+
+        encoded = urlsafe_b64encode(json.dumps(tokens, separators=(',', ':')).encode())
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode())
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if len(tokens['p']) != len(self.fields):
+                raise ValueError('Cursor does not match the ordering')
+            position = [
+                field.to_python(value) for field, value in zip(self.fields, tokens['p'])
+            ]
+            reverse = bool(tokens.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def get_paginated_response(self, data):
+        next_link = self.get_next_link()
+        previous_link = self.get_previous_link()
+        return Response(
+            {
+                "links": {
+                    "next": next_link,
+                    "previous": previous_link,
+                },
+                "count": None,
+                "next": next_link,
+                "previous": previous_link,
                 "results": data,
             }
         )
+
+    def _get_position(self, instance):
+        return [field.value_to_string(instance) for field in self.fields]
+
+    @staticmethod
+    def _get_field(model, ordering_item):
+        name = ordering_item.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
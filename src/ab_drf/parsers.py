@@ -0,0 +1,31 @@
+"""
+=======
+Parsers
+=======
+"""
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .encoders import get_json_backend
+
+
+class CustomJSONParser(parsers.JSONParser):
+    """
+    Parses JSON request bodies with the backend configured with ``AB_DRF_JSON_BACKEND``, the
+    counterpart of :class:`ab_drf.renderer.CustomRenderer`.
+    """
+
+    #: Name of the JSON backend (see :mod:`ab_drf.encoders`), ``AB_DRF_JSON_BACKEND`` if unset
+    json_backend = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            return get_json_backend(self.json_backend).loads(
+                stream.read(), encoding, strict=self.strict
+            )
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,9 +1,17 @@
 import logging
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
 from rest_framework.permissions import DjangoModelPermissions
 from rest_framework.permissions import BasePermission
 
 L = logging.getLogger(__name__)
 
+# ``hops``: the forward foreign keys followed before the last field, ``field``: the last field
+OwnershipPath = namedtuple("OwnershipPath", ["hops", "field"])
+
 
 class DjangoModelPermissionsWithRead(DjangoModelPermissions):
 
@@ -26,8 +34,14 @@ class IsOwnerPermissions(BasePermission):
     of object, If it's an empty object, ``True`` will always return.
 
     .. note:: Condition check on ``ownership_fields`` will be done in ORing fashion
+
+    Paths made of forward foreign keys (``"project__owner"``) are resolved once per view class
+    (see :func:`compile_ownership_path`) and checked against the ``owner_id`` column, without
+    loading the user or, when ``project`` is already loaded, anything (see :func:`get_owner_id`).
     """
 
+    _compiled_paths = {}
+
     def has_object_permission(self, request, view, obj):
         """
         Checks for the single object if its user is same as obj. If you want to skip the owner
@@ -45,9 +59,9 @@ class IsOwnerPermissions(BasePermission):
         if _u == obj:
             return True
 
+        paths = self.get_ownership_paths(view, obj.__class__, ownership_fields)
         result = any(
-            _u == self._get(obj, field) or _u.id == self._get(obj, field)
-            for field in ownership_fields
+            self.is_owner(_u, obj, field, paths[field]) for field in ownership_fields
         )
         if result is False:
             logging.warning(
@@ -57,6 +71,27 @@ class IsOwnerPermissions(BasePermission):
 
         return result
 
+    @classmethod
+    def get_ownership_paths(cls, view, model, ownership_fields):
+        """
+        ``{field: OwnershipPath or None}``, resolved against the model once per view class
+        """
+        key = (view.__class__, model, tuple(ownership_fields))
+        paths = cls._compiled_paths.get(key)
+        if paths is None:
+            paths = cls._compiled_paths[key] = {
+                field: compile_ownership_path(model, field) for field in ownership_fields
+            }
+        return paths
+
+    def is_owner(self, user, obj, field, path):
+        if path is None:
+            # Not made of model fields, e.g. a property
+            value = self._get(obj, field)
+            return user == value or user.id == value
+
+        return user.pk is not None and get_owner_id(obj, path) == user.pk
+
     @staticmethod
     def _get(obj, path):
         paths = path.split("__")
@@ -69,6 +104,67 @@ class IsOwnerPermissions(BasePermission):
         return obj
 
 
+def compile_ownership_path(model, path):
+    """
+    Resolves an ownership ``path`` (``"project__owner"``) of ``model`` to the forward foreign
+    keys to follow and the last field, whose column holds the user id. Returns ``None`` for paths
+    that go through a to-many relation, a reverse relation, or something that isn't a field, and
+    for those ending on a relation to another model than the user's.
+    """
+    user_model = get_user_model()._meta.concrete_model
+    names = path.split(LOOKUP_SEP)
+    hops = []
+    for name in names[:-1]:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not (field.many_to_one or field.one_to_one) or not field.concrete:
+            return None
+        hops.append(field)
+        model = field.related_model
+
+    try:
+        field = model._meta.get_field(names[-1])
+    except FieldDoesNotExist:
+        return None
+
+    if field.is_relation:
+        if not (field.many_to_one or field.one_to_one) or not field.concrete:
+            return None
+        if field.related_model._meta.concrete_model is not user_model:
+            return None
+        if field.target_field is not field.related_model._meta.pk:
+            return None
+    elif hops and field is hops[-1].target_field:
+        # "owner__id" is the "owner_id" column
+        field = hops.pop()
+
+    return OwnershipPath(tuple(hops), field)
+
+
+def get_owner_id(obj, path):
+    """
+    Reads the value of a compiled ownership ``path`` of ``obj``. The last hop is read from the
+    ``<fk>_id`` attribute, related objects already loaded are used, and the rest is fetched with
+    one query.
+    """
+    for depth, hop in enumerate(path.hops):
+        if getattr(obj, hop.attname) is None:
+            return None
+        if not hop.is_cached(obj):
+            names = [field.name for field in path.hops[depth:]] + [path.field.name]
+            return (
+                obj.__class__._base_manager.db_manager(obj._state.db)
+                .filter(pk=obj.pk)
+                .values_list(LOOKUP_SEP.join(names), flat=True)
+                .first()
+            )
+        obj = getattr(obj, hop.name)
+
+    return getattr(obj, path.field.attname)
+
+
 class ActionPermissions(BasePermission):
     """
     Permission class that checks for custom permissions defined under model's meta option.
@@ -1,8 +1,15 @@
+from collections.abc import Iterator
+
 from rest_framework import renderers, status
+from rest_framework.compat import INDENT_SEPARATORS, LONG_SEPARATORS, SHORT_SEPARATORS
+
+from .encoders import get_json_backend
+from .timing import timed
 
 RESPONSE_MESSAGE = {
     status.HTTP_200_OK: 'Data',
     status.HTTP_201_CREATED: 'Created',
+    status.HTTP_202_ACCEPTED: 'Accepted',
     status.HTTP_204_NO_CONTENT: 'No Content',
     status.HTTP_400_BAD_REQUEST: 'Bad Request',
     status.HTTP_401_UNAUTHORIZED: 'Unauthorized',
@@ -13,18 +20,108 @@ RESPONSE_MESSAGE = {
     status.HTTP_501_NOT_IMPLEMENTED: 'Method not Implemented'
 }
 
+SUCCESS_STATUS_CODES = frozenset((
+    status.HTTP_200_OK, status.HTTP_201_CREATED, status.HTTP_202_ACCEPTED,
+    status.HTTP_204_NO_CONTENT
+))
+
+# Keys consumed by the envelope itself, so they're left out of the content
+PAYLOAD_KEYS = frozenset(('message', 'response_data', 'additional_info', 'response_message'))
+RESPONSE_DATA_KEYS = frozenset(('additional_info', 'response_message'))
+
 
 class CustomRenderer(renderers.JSONRenderer):
+    #: Name of the JSON backend (see :mod:`ab_drf.encoders`), ``AB_DRF_JSON_BACKEND`` if unset
+    json_backend = None
+
     def render(self, data, accepted_media_type=None, renderer_context=None):
         renderer_context = renderer_context or {}
+        with timed(renderer_context.get('request'), 'render'):
+            envelope = self.get_envelope(data, renderer_context)
+            indent = self.get_indent(accepted_media_type, renderer_context)
+            return self._dumps(envelope, self.get_separators(indent), indent)
+
+    def render_stream(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Yields the envelope as byte chunks: the ``success/message/status/count`` header first,
+        then one chunk per result row. Joined together, the chunks are byte-identical to
+        :meth:`render`.
+
+        ``results`` may be a lazy iterator of already serialized rows, which lets list views
+        encode rows one at a time instead of holding the whole payload in memory.
+        """
+        renderer_context = renderer_context or {}
+        envelope = self.get_envelope(data, renderer_context)
+        results = envelope.get('results')
+        indent = self.get_indent(accepted_media_type, renderer_context)
+
+        if indent is not None or not isinstance(results, (list, tuple, Iterator)):
+            # Pretty printed output nests rows by indentation level; not worth streaming
+            if isinstance(results, Iterator):
+                envelope['results'] = list(results)
+            yield self._dumps(envelope, self.get_separators(indent), indent)
+            return
+
+        item_separator, key_separator = self.get_separators(indent)
+
+        # `results` is always the last key of the envelope, so the header is the envelope
+        # without it, left open.
+        header = {key: value for key, value in envelope.items() if key != 'results'}
+        yield b''.join((
+            self._dumps(header, (item_separator, key_separator))[:-1],
+            (item_separator + '"results"' + key_separator + '[').encode(),
+        ))
+
+        row_prefix = b''
+        for row in results:
+            yield row_prefix + self._dumps(row, (item_separator, key_separator))
+            row_prefix = item_separator.encode()
+
+        yield b']}'
+
+    def get_separators(self, indent):
+        if indent is not None:
+            return INDENT_SEPARATORS
+        return SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+
+    def _dumps(self, data, separators, indent=None):
+        return get_json_backend(self.json_backend).dumps(
+            data, self.encoder_class, ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict, indent=indent, separators=separators
+        )
+
+    def get_envelope(self, data, renderer_context):
+        """
+        Builds the response envelope in a single pass over ``data``, which is never copied
+        nor modified.
+        """
         response = renderer_context.get('response')
         status_code = getattr(response, 'status_code', None)
 
-        sanitized_payload = data.copy() if isinstance(data, dict) else data
-        message = self._extract_message(sanitized_payload, status_code)
-        content, additional_info = self._extract_content(sanitized_payload)
+        message = None
+        additional_info = None
+        content = data
+        reserved_keys = ()
+
+        if isinstance(data, dict):
+            message = data.get('message')
+            additional_info = data.get('additional_info')
+            response_data = data.get('response_data')
+
+            if response_data is None:
+                reserved_keys = PAYLOAD_KEYS
+            else:
+                content = response_data
+                if isinstance(response_data, dict):
+                    reserved_keys = RESPONSE_DATA_KEYS
+                    if message is None:
+                        message = response_data.get('response_message')
+                    if response_data.get('additional_info') is not None:
+                        additional_info = response_data['additional_info']
+
+        message = message or RESPONSE_MESSAGE.get(status_code)
 
-        if status_code in [status.HTTP_200_OK, status.HTTP_201_CREATED, status.HTTP_204_NO_CONTENT]:
+        if status_code in SUCCESS_STATUS_CODES:
             envelope = {
                 'success': True,
                 'message': message,
@@ -33,72 +130,49 @@ class CustomRenderer(renderers.JSONRenderer):
             if additional_info is not None:
                 envelope['additional_info'] = additional_info
 
-            if content is not None:
-                if isinstance(content, dict) and 'results' in content:
-                    envelope.update({
-                        'count': content.get('count'),
-                        'next': content.get('next'),
-                        'previous': content.get('previous'),
-                        'results': content.get('results')
-                    })
+            if isinstance(content, dict):
+                if 'results' in content:
+                    envelope['count'] = content.get('count')
+                    if 'count_is_approximate' in content:
+                        envelope['count_is_approximate'] = content['count_is_approximate']
+                    envelope['next'] = content.get('next')
+                    envelope['previous'] = content.get('previous')
+                    envelope['results'] = content['results']
+                elif any(key in content for key in reserved_keys):
+                    envelope['results'] = {
+                        key: value for key, value in content.items() if key not in reserved_keys
+                    }
                 else:
-                    envelope.update({'results': content})
+                    envelope['results'] = content
+            elif content is not None:
+                envelope['results'] = content
         else:
-            envelope = {
-                'success': False,
-                'error': {},
-                'message': message,
-                'status': status_code
-            }
             if isinstance(content, dict):
                 if 'detail' in content:
-                    envelope['error']['non_field_errors'] = [content['detail']]
+                    error = {'non_field_errors': [content['detail']]}
                 elif 'non_field_errors' in content:
-                    envelope['error']['non_field_errors'] = content['non_field_errors']
+                    error = {'non_field_errors': content['non_field_errors']}
                 else:
-                    envelope['error'] = self.flatten_field_errors(content)
-            elif content is not None:
-                if isinstance(content, list):
-                    envelope['error']['non_field_errors'] = content
-                else:
-                    envelope['error']['non_field_errors'] = [content]
-
-        return super().render(envelope, accepted_media_type, renderer_context)
-
-    def _extract_message(self, payload, status_code):
-        default_message = RESPONSE_MESSAGE.get(status_code)
-        if not isinstance(payload, dict):
-            return default_message
-
-        message = payload.pop('message', None)
-        response_data = payload.get('response_data')
-        if message is None and isinstance(response_data, dict):
-            message = response_data.get('response_message')
-
-        return message or default_message
-
-    def _extract_content(self, payload):
-        if not isinstance(payload, dict):
-            return payload, None
-
-        response_data = payload.pop('response_data', None)
-        content_source = response_data if response_data is not None else payload
-
-        additional_info = None
-        if isinstance(content_source, dict):
-            additional_info = content_source.pop('additional_info', None)
-            content_source.pop('response_message', None)
+                    error = self.flatten_field_errors(content, reserved_keys)
+            elif content is None:
+                error = {}
+            elif isinstance(content, list):
+                error = {'non_field_errors': content}
+            else:
+                error = {'non_field_errors': [content]}
 
-        if additional_info is None and isinstance(payload, dict):
-            additional_info = payload.pop('additional_info', None)
+            envelope = {
+                'success': False,
+                'error': error,
+                'message': message,
+                'status': status_code
+            }
 
-        return content_source, additional_info
+        return envelope
 
-    def flatten_field_errors(self, data):
-        field_errors = {}
-        for field, errors in data.items():
-            if isinstance(errors, list) and len(errors) == 1:
-                field_errors[field] = errors[0]
-            else:
-                field_errors[field] = errors
-        return field_errors
+    def flatten_field_errors(self, data, exclude=()):
+        return {
+            field: errors[0] if isinstance(errors, list) and len(errors) == 1 else errors
+            for field, errors in data.items()
+            if field not in exclude
+        }
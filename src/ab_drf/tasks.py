@@ -1,10 +1,66 @@
+from functools import partial
+
 from celery import task
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+from .helpers import BatchDeleter, purge_soft_deleted as _purge_soft_deleted
+from .jobs import running_job, update_job
+from .ordering import RebalanceInProgress, rebalance
+
+DELETE_CHECKPOINT_KEY = 'ab_drf:delete:%s:%s'
+
+
+@task
+def delete_objects(pk, content_type_id, job_id=None):
+    """
+    Deletes an object, or a list of objects, and its cascade in batches, see
+    :class:`ab_drf.helpers.BatchDeleter`. A retried task resumes from the last checkpoint.
+    The job's progress is the number of deleted rows.
+    """
+    with running_job(job_id):
+        content_type = ContentType.objects.get(id=content_type_id)
+        model = content_type.model_class()
+
+        deleted = 0
+        pks = pk if isinstance(pk, (list, tuple)) else [pk]
+        for pk in pks:
+            obj = model._base_manager.filter(pk=pk).first()
+            checkpoint_key = DELETE_CHECKPOINT_KEY % (content_type_id, pk)
+            if obj is None:
+                # Finished by a previous run
+                cache.delete(checkpoint_key)
+                continue
+
+            deleter = BatchDeleter(obj, checkpoint_key=checkpoint_key)
+            if job_id is not None:
+                deleter.on_progress = partial(report_deleted, job_id, deleted)
+            deleted += deleter.run()
+
+
+def report_deleted(job_id, previously_deleted, deleted):
+    update_job(job_id, progress={'deleted': previously_deleted + deleted})
+
+
+@task
+def purge_soft_deleted():
+    """
+    Purges soft deleted rows and their cascade in batches, see
+    :func:`ab_drf.helpers.purge_soft_deleted`. Meant to be scheduled often with celery beat,
+    it only works within ``AB_DRF_PURGE_HOURS``.
+    """
+    return _purge_soft_deleted()
 
 
 @task
-def delete_objects(pk, content_type_id):
-    content_type = ContentType.objects.get(id=content_type_id)
-    model = content_type.model_class()
-    obj = model.objects.get(pk=pk)
-    obj.delete()
\ No newline at end of file
+def rebalance_order(content_type_id, scope=None):
+    """
+    Spreads the ``the_order`` keys of a list of a model again, see
+    :func:`ab_drf.ordering.rebalance`. Queued by :class:`ab_drf.mixins.ReorderViewSetMixin`
+    when a move ran out of room; does nothing if the list is being spread already.
+    """
+    model = ContentType.objects.get(id=content_type_id).model_class()
+    try:
+        return rebalance(model, scope)
+    except RebalanceInProgress:
+        return 0
@@ -195,6 +195,7 @@ class MyModelViewSetDestroyTests(TestCase):
         request = self.factory.delete(f"/dummy/{self.instance.pk}/")
 
         mocked_delete.delay = Mock()
+        mocked_delete.name = "ab_drf.tasks.delete_objects"
         mocked_get_for_model.return_value = types.SimpleNamespace(id=42)
         MyModelViewSet.destroy.__globals__["get_deleted_objects"] = mocked_deleted
         MyModelViewSet.destroy.__globals__["delete_objects"] = mocked_delete
@@ -208,5 +209,7 @@ class MyModelViewSetDestroyTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         mocked_deleted.assert_called_once()
-        mocked_delete.delay.assert_called_once_with(self.instance.pk, 42)
+        mocked_delete.delay.assert_called_once_with(
+            self.instance.pk, 42, job_id=response.data["job_id"]
+        )
         mocked_perform_destroy.assert_not_called()
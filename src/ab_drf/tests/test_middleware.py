@@ -1,9 +1,13 @@
+import gzip
+import uuid
+import zlib
 from io import BytesIO
 
 import django
 from django.conf import settings
 from django.http import FileResponse, HttpResponse, StreamingHttpResponse
-from django.test import RequestFactory, SimpleTestCase
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, override_settings
 
 if not settings.configured:
     settings.configure(
@@ -25,7 +29,8 @@ if not settings.configured:
     )
     django.setup()
 
-from ab_drf.middleware import HeadInfoMiddleware
+from ab_drf.middleware import CompressionMiddleware, HeadInfoMiddleware, negotiate_encoding
+from ab_drf.timing import timed
 
 
 class HeadInfoMiddlewareTests(SimpleTestCase):
@@ -77,3 +82,132 @@ class HeadInfoMiddlewareTests(SimpleTestCase):
         response = middleware(self.get_request())
 
         self.assertEqual(response.get('Content-Length'), expected_length)
+
+    def test_request_id_is_a_uuid4(self):
+        request = self.get_request()
+        response = HeadInfoMiddleware(lambda _: HttpResponse('hello'))(request)
+
+        self.assertEqual(uuid.UUID(response['X-Request-Id']).version, 4)
+        self.assertEqual(response['X-Request-Id'], request.id)
+
+
+class ServerTimingTests(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    @staticmethod
+    def get_response(request):
+        with timed(request, 'filter'):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.execute('SELECT 2')
+        return HttpResponse('hello')
+
+    def test_no_header_by_default(self):
+        response = HeadInfoMiddleware(self.get_response)(self.factory.get('/'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(AB_DRF_SERVER_TIMING=True)
+    def test_reports_phases_and_queries(self):
+        request = self.factory.get('/')
+        response = HeadInfoMiddleware(self.get_response)(request)
+
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(metrics, ['filter', 'total', 'db'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+        timings = request.server_timing.as_dict()
+        self.assertEqual(timings['db_queries'], 2)
+        self.assertGreaterEqual(timings['total'], timings['filter'])
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"results":[%s]}' % b','.join(b'{"id":%d}' % i for i in range(100))
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    def get_response(self, response, accept_encoding='gzip, deflate'):
+        middleware = CompressionMiddleware(lambda _: response)
+        return middleware(self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_compresses_with_gzip(self):
+        response = self.get_response(HttpResponse(self.body))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_negotiates_deflate(self):
+        response = self.get_response(HttpResponse(self.body), 'gzip;q=0.5, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(response.content), self.body)
+
+    def test_negotiation(self):
+        supported = ('gzip', 'deflate')
+
+        self.assertEqual(negotiate_encoding('deflate, gzip', supported), 'gzip')
+        self.assertEqual(negotiate_encoding('*;q=0.1, gzip;q=0', supported), 'deflate')
+        self.assertIsNone(negotiate_encoding('br, identity', supported))
+        self.assertIsNone(negotiate_encoding('', supported))
+
+    def test_skips_small_and_unaccepted_bodies(self):
+        response = self.get_response(HttpResponse('hello'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+        response = self.get_response(HttpResponse(self.body), 'br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, self.body)
+
+    def test_compresses_streaming_response_by_chunk(self):
+        chunks = [self.body[i:i + 64] for i in range(0, len(self.body), 64)]
+        response = StreamingHttpResponse(iter(chunks))
+        response['Content-Length'] = str(len(self.body))
+
+        response = self.get_response(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIsNone(response.get('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body)
+
+    @override_settings(AB_DRF_COMPRESSION_FLUSH_SIZE=256)
+    def test_streaming_output_is_flushed_past_the_flush_size(self):
+        chunks = [self.body[i:i + 64] for i in range(0, len(self.body), 64)]
+        response = self.get_response(StreamingHttpResponse(iter(chunks)))
+
+        # Each flush lets the client decode everything sent so far
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decoded = [decompressor.decompress(compressed)
+                   for compressed in response.streaming_content]
+        self.assertEqual(b''.join(decoded), self.body)
+        self.assertEqual(b''.join(decoded[:2]), self.body[:256])
+
+    def test_streaming_small_chunks_compress_like_the_whole_body(self):
+        rows = [b'{"id":%d,"name":"row %d"},' % (i, i) for i in range(10000)]
+        response = self.get_response(StreamingHttpResponse(iter(rows)))
+
+        streamed = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(streamed), b''.join(rows))
+        self.assertLess(len(streamed), len(gzip.compress(b''.join(rows), 6)) * 1.1)
+
+    def test_skips_server_errors_and_no_transform(self):
+        response = self.get_response(HttpResponse(self.body, status=500))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.get_response(HttpResponse(self.body, status=400))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        response = HttpResponse(self.body)
+        response['Cache-Control'] = 'private, no-transform'
+        response = self.get_response(response)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
@@ -0,0 +1,102 @@
+"""
+======
+Timing
+======
+Per-request phase timings, reported in the ``Server-Timing`` response header by
+:class:`ab_drf.middleware.HeadInfoMiddleware` when ``AB_DRF_SERVER_TIMING`` is on.
+
+Phases:
+
+* ``auth``: authentication, permissions and throttling (``APIView.initial()``)
+* ``filter``: filter backends (``filter_queryset()``)
+* ``db``: time spent executing SQL, with the number of queries
+* ``serialize``: time spent in the view handler outside of the phases above, which is mostly
+  serialization
+* ``render``: rendering the response body
+* ``total``: the whole request, as seen by the middleware
+"""
+
+__all__ = ['ServerTiming', 'get_server_timing', 'timed']
+
+import time
+from contextlib import contextmanager
+
+
+class ServerTiming:
+    """
+    Collects phase durations of a single request. It is also a database execute wrapper, see
+    https://docs.djangoproject.com/en/3.2/topics/db/instrumentation/
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.db_time = 0.0
+        self.db_queries = 0
+        self._handler_start = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+    def add(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def start_handler(self):
+        self._handler_start = (time.perf_counter(), self._accounted())
+
+    def end_handler(self):
+        if self._handler_start is None:
+            return
+
+        start, accounted = self._handler_start
+        self._handler_start = None
+        elapsed = time.perf_counter() - start
+        self.add('serialize', max(elapsed - (self._accounted() - accounted), 0.0))
+
+    def _accounted(self):
+        return self.db_time + sum(self.phases.values())
+
+    def as_dict(self):
+        """
+        Durations in milliseconds, for logging
+        """
+        timings = {name: round(duration * 1000, 3) for name, duration in self.phases.items()}
+        timings['db'] = round(self.db_time * 1000, 3)
+        timings['db_queries'] = self.db_queries
+        return timings
+
+    def header(self):
+        metrics = ['%s;dur=%.3f' % (name, duration * 1000)
+                   for name, duration in self.phases.items()]
+        metrics.append('db;dur=%.3f;desc="%d queries"' % (self.db_time * 1000, self.db_queries))
+        return ', '.join(metrics)
+
+
+def get_server_timing(request):
+    """
+    Returns the :class:`ServerTiming` of a Django or DRF request, ``None`` if timing is off.
+    """
+    return getattr(request, 'server_timing', None)
+
+
+@contextmanager
+def timed(request, name):
+    timing = get_server_timing(request)
+    if timing is None:
+        yield
+        return
+
+    with timing.phase(name):
+        yield
@@ -0,0 +1,221 @@
+"""
+=====
+Views
+=====
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .jobs import get_job
+from .renderer import CustomRenderer
+
+L = logging.getLogger('app.' + __name__)
+
+
+class BatchView(APIView):
+    """
+    Runs several API calls in one HTTP request.
+
+    Each item is dispatched in-process through the URL resolver as the batch request's
+    authenticated user, so it doesn't pay for the network round trip, the middleware stack or
+    authentication again. The response results are the items' envelopes (see
+    :class:`ab_drf.renderer.CustomRenderer`), in the same order.
+
+    Request body::
+
+        {
+            "parallel": true,
+            "requests": [
+                {"method": "GET", "path": "/api/v1/projects?page=2"},
+                {"method": "PATCH", "path": "/api/v1/projects/3", "body": {"name": "New"}}
+            ]
+        }
+
+    A plain list of items is accepted as well. With ``parallel``, the ``GET`` items before the
+    first write are run concurrently on a thread pool. Other methods, and every item after a
+    write, run one after the other, in order: threads use their own database connections, which
+    wouldn't see the batch's uncommitted writes (under ``ATOMIC_REQUESTS`` for instance).
+
+    Usage, next to a router::
+
+        urlpatterns = router.urls + [path('batch', BatchView.as_view())]
+    """
+
+    max_requests = 20
+    max_workers = 4
+    batch_methods = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+    envelope_renderer_class = CustomRenderer
+
+    def post(self, request, *args, **kwargs):
+        items, parallel = self.get_items(request.data)
+
+        if not parallel:
+            return Response([self.run_item(request, item, i) for i, item in enumerate(items)])
+
+        envelopes = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = []
+            wrote = False
+            for i, item in enumerate(items):
+                if item['method'] == 'GET' and not wrote:
+                    pending.append((i, executor.submit(self.run_threaded_item, request, item, i)))
+                    continue
+
+                # Reads queued before a write must complete first
+                self.collect(pending, envelopes)
+                envelopes[i] = self.run_item(request, item, i)
+                wrote = wrote or item['method'] != 'GET'
+
+            self.collect(pending, envelopes)
+
+        return Response(envelopes)
+
+    @staticmethod
+    def collect(pending, envelopes):
+        for i, future in pending:
+            envelopes[i] = future.result()
+        pending.clear()
+
+    def get_items(self, data):
+        parallel = False
+        if isinstance(data, dict):
+            parallel = bool(data.get('parallel', False))
+            data = data.get('requests')
+
+        if not isinstance(data, list) or not data:
+            raise ValidationError({'requests': ['Expected a non-empty list of requests.']})
+        if len(data) > self.max_requests:
+            raise ValidationError({'requests': [
+                'Ensure this list has no more than %d requests.' % self.max_requests
+            ]})
+
+        items = []
+        for item in data:
+            if not isinstance(item, dict) or not str(item.get('path', '')).startswith('/'):
+                raise ValidationError({'requests': [
+                    'Each request needs a "path" starting with "/".'
+                ]})
+
+            method = str(item.get('method', 'GET')).upper()
+            if method not in self.batch_methods:
+                raise ValidationError({'requests': ['Method "%s" is not allowed.' % method]})
+
+            items.append({'method': method, 'path': item['path'], 'body': item.get('body')})
+
+        return items, parallel
+
+    def run_threaded_item(self, request, item, index):
+        try:
+            return self.run_item(request, item, index)
+        finally:
+            # Worker threads open their own connections
+            connections.close_all()
+
+    def run_item(self, request, item, index):
+        sub_request = self.build_request(request, item, index)
+
+        try:
+            match = resolve(sub_request.path_info)
+        except Resolver404:
+            return self.get_envelope(None, status.HTTP_404_NOT_FOUND)
+
+        view_class = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None)
+        if isinstance(view_class, type) and issubclass(view_class, BatchView):
+            return self.get_envelope(
+                {'detail': 'Batch requests can not be nested.'}, status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            response = match.func(sub_request, *match.args, **match.kwargs)
+        except Exception:
+            L.exception('Batch request failed', extra={
+                'request': request, 'path': item['path'], 'method': item['method'],
+            })
+            return self.get_envelope(None, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return self.get_envelope(getattr(response, 'data', None), response.status_code)
+
+    def build_request(self, request, item, index):
+        """
+        Builds the WSGI request of a batch item from the batch request's environment
+        """
+        path, _, query_string = item['path'].partition('?')
+        body = b'' if item['body'] is None else json.dumps(item['body']).encode()
+
+        environ = dict(request._request.META)
+        environ.update({
+            'REQUEST_METHOD': item['method'],
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query_string,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+        })
+        sub_request = WSGIRequest(environ)
+        # Views answer with a response holding `data`, see `StreamingListViewSetMixin`
+        sub_request.batch_item = True
+
+        # Reuse the batch request's authentication, see `rest_framework.request.Request`
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        sub_request.user = request.user
+
+        request_id = getattr(request, 'id', None)
+        if request_id is not None:
+            sub_request.id = '%s-%d' % (request_id, index)
+
+        return sub_request
+
+    def get_envelope(self, data, status_code):
+        return self.envelope_renderer_class().get_envelope(
+            data, {'response': Response(status=status_code)}
+        )
+
+
+class JobStatusView(APIView):
+    """
+    Reports a job queued by :class:`ab_drf.mixins.OffloadViewSetMixin`::
+
+        {
+            "job_id": "...", "name": "ab_drf.tasks.delete_objects",
+            "status": "running", "progress": {"deleted": 1500}, "error": null,
+            "created_at": "...", "updated_at": "..."
+        }
+
+    Only the user who queued the job, or staff, can see it. Jobs queued without a user are for
+    staff only. Usage::
+
+        urlpatterns += [path('jobs/<str:job_id>', JobStatusView.as_view(), name='job-status')]
+    """
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_job(job_id)
+        if job is None or not self.can_view(request, job):
+            raise NotFound()
+
+        return Response({
+            'job_id': job['id'],
+            'name': job['name'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+        })
+
+    def can_view(self, request, job):
+        user = request.user
+        if getattr(user, 'is_staff', False):
+            return True
+        return job['user_id'] is not None and job['user_id'] == getattr(user, 'pk', None)
@@ -1,37 +1,65 @@
 # -*- coding: utf-8 -*-
 
 from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 
 from .helpers import get_deleted_objects
+from .mixins.db import SoftDeleteModelMixin
+from .mixins.viewset import OffloadViewSetMixin
 from .tasks import delete_objects
+from .timing import get_server_timing, timed
 
-class MyGenericViewSet(viewsets.GenericViewSet):
+class MyGenericViewSet(OffloadViewSetMixin, viewsets.GenericViewSet):
     """Custom API response format."""
     
     def get_requet_method_type(self):
         return self.request.method
 
+    def initial(self, request, *args, **kwargs):
+        timing = get_server_timing(request)
+        if timing is None:
+            return super().initial(request, *args, **kwargs)
+
+        with timing.phase('auth'):
+            super().initial(request, *args, **kwargs)
+        timing.start_handler()
+
+    def filter_queryset(self, queryset):
+        with timed(self.request, 'filter'):
+            return super().filter_queryset(queryset)
+
     def finalize_response(self, request, response, *args, **kwargs):
         # Override response (is there a better way to do this?)
+        timing = get_server_timing(request)
+        if timing is not None:
+            timing.end_handler()
 
         return super().finalize_response(request, response, *args, **kwargs)
     
     def destroy_object(self, request, model, pk):
+        """
+        Queues the deletion of a large object, returning the ``202`` response of the job.
+        Returns ``None`` when the object is small enough to be deleted inline.
+        """
         obj = model.objects.get(pk=pk)
-        deleted_objects, model_count, protected = get_deleted_objects([obj])
+        if isinstance(obj, SoftDeleteModelMixin):
+            # Soft deleting is a single UPDATE
+            return None
 
-        length_deleted_obj = 0
-        for models, obj in model_count.items():
-            length_deleted_obj += obj
+        deleted_objects, model_count, protected = get_deleted_objects(
+            [obj], count_only=True, limit=self.offload_threshold
+        )
 
-        if length_deleted_obj > int(100):
+        if self.should_offload(sum(model_count.values())):
             content_type = ContentType.objects.get_for_model(model)
-            delete_objects.delay(pk, content_type.id)
-            return True
+            return self.offload(delete_objects, pk, content_type.id)
 
-        return False
+        return None
 
 
 class MyModelViewSet(
@@ -44,15 +72,20 @@ class MyModelViewSet(
 ):
     """Custom API response format."""
 
+    bulk_destroy_max_ids = 1000
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        deleted_objects, model_count, protected = get_deleted_objects([instance])
+        if isinstance(instance, SoftDeleteModelMixin):
+            # A single UPDATE whatever the size of the cascade, which is purged later
+            self.perform_destroy(instance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        length_deleted_obj = 0
-        for models, obj in model_count.items():
-            length_deleted_obj += obj
+        deleted_objects, model_count, protected = get_deleted_objects(
+            [instance], count_only=True, limit=self.offload_threshold
+        )
 
-        if length_deleted_obj > int(100):
+        if self.should_offload(sum(model_count.values())):
             queryset = None
             try:
                 queryset = self.get_queryset()
@@ -64,11 +97,57 @@ class MyModelViewSet(
             model = getattr(queryset, "model", instance.__class__)
 
             content_type = ContentType.objects.get_for_model(model)
-            delete_objects.delay(instance.pk, content_type.id)
-            return Response(status=status.HTTP_202_ACCEPTED)
+            return self.offload(delete_objects, instance.pk, content_type.id)
 
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'])
+    def action_bulk_destroy(self, request, *args, **kwargs):
+        """
+        Deletes the objects of the posted ``{"ids": [...]}`` the user can see, that is among the
+        filtered queryset, with the same inline or background decision as :meth:`destroy` made
+        once for the whole set.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        ids = self.get_bulk_ids(request.data, queryset.model)
+        instances = list(queryset.filter(pk__in=ids))
+        for instance in instances:
+            self.check_object_permissions(request, instance)
+
+        if not instances:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        # Soft deleting is one UPDATE per object whatever the size of the cascade, no preview
+        if not isinstance(instances[0], SoftDeleteModelMixin):
+            deleted_objects, model_count, protected = get_deleted_objects(
+                instances, count_only=True, limit=self.offload_threshold
+            )
+
+            if self.should_offload(sum(model_count.values())):
+                content_type = ContentType.objects.get_for_model(queryset.model)
+                return self.offload(
+                    delete_objects, [instance.pk for instance in instances], content_type.id
+                )
+
+        with transaction.atomic():
+            for instance in instances:
+                self.perform_destroy(instance)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def get_bulk_ids(self, data, model):
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({'ids': ['Expected a non-empty list of ids.']})
+        if len(ids) > self.bulk_destroy_max_ids:
+            raise ValidationError({'ids': [
+                'Ensure this list has no more than %d ids.' % self.bulk_destroy_max_ids
+            ]})
+
+        try:
+            return {model._meta.pk.to_python(pk) for pk in ids}
+        except DjangoValidationError:
+            raise ValidationError({'ids': ['Invalid id.']})
 
 
 
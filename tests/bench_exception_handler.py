@@ -0,0 +1,100 @@
+"""
+Benchmark of the error path of :func:`ab_drf.helpers.custom_exception_handler`.
+
+Compares error responses per second with the previous ``inspect.trace()`` based culprit
+resolution and with the current one, when the warning is logged and when it is filtered out::
+
+    python tests/bench_exception_handler.py [--requests 5000] [--depth 15]
+"""
+import argparse
+import inspect
+import logging
+import os
+import sys
+import time
+import traceback
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'rest_framework'],
+        SECRET_KEY='bench-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from rest_framework.exceptions import NotFound
+from rest_framework.views import exception_handler
+
+from ab_drf import helpers
+
+
+class DummyRequest:
+    id = 'bench-request'
+    META = {}
+
+
+def legacy_exception_handler(exc, context):
+    """
+    The handler before the culprit was resolved from the traceback objects, for comparison
+    """
+    response = exception_handler(exc, context)
+    request = context.get('request')
+
+    frm = inspect.trace()[-1]
+    mod = inspect.getmodule(frm[0])
+    func = traceback.extract_tb(sys.exc_info()[2])[-1][2]
+    log_extra = {'request': request, 'request_id': request.id,
+                 'culprit': "%s in %s" % (mod.__name__, func)}
+
+    helpers.L.warning(exc, extra=log_extra, exc_info=True)
+    response.data['_context'] = 'error'
+    response.data['type'] = exc.__class__.__name__
+    response.data['status_code'] = response.status_code
+    response.data['error_code'] = getattr(exc, 'error_code', 0)
+    return response
+
+
+def raise_nested(depth):
+    if depth:
+        raise_nested(depth - 1)
+    raise NotFound()
+
+
+def measure(handler, requests, depth):
+    context = {'request': DummyRequest()}
+    start = time.perf_counter()
+    for _ in range(requests):
+        try:
+            raise_nested(depth)
+        except NotFound as exc:
+            handler(exc, context)
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--depth', type=int, default=15)
+    args = parser.parse_args()
+
+    logger = logging.getLogger('app.ab_drf.helpers')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    print('%-22s %16s %16s' % ('logging', 'before (req/s)', 'after (req/s)'))
+    for name, level in (('warning emitted', logging.WARNING), ('warning filtered', logging.ERROR)):
+        logger.setLevel(level)
+        before = measure(legacy_exception_handler, args.requests, args.depth)
+        after = measure(helpers.custom_exception_handler, args.requests, args.depth)
+        print('%-22s %16.0f %16.0f' % (name, before, after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark of the :class:`ab_drf.filters.OwnerOrStaffFilterBackend` strategies.
+
+Seeds a sqlite database with projects and tickets reachable through to-one and to-many
+ownership paths, then measures, per strategy, how long a user's first page and count take::
+
+    python tests/bench_filters.py [--tickets 20000] [--users 200] [--repeat 20] [--database db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument('--tickets', type=int, default=20000)
+parser.add_argument('--users', type=int, default=200)
+parser.add_argument('--repeat', type=int, default=20)
+parser.add_argument('--database', default=':memory:')
+args = parser.parse_args()
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'rest_framework'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': args.database}},
+        SECRET_KEY='bench-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, models, transaction
+
+from ab_drf.filters import OWNERSHIP_STRATEGIES, OwnerOrStaffFilterBackend
+
+FIELDS = ['assignee', 'project__owner', 'project__members', 'watchers']
+
+
+class Project(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    members = models.ManyToManyField(User, related_name='+')
+
+    class Meta:
+        app_label = 'auth'
+
+
+class Ticket(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    assignee = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='+')
+    watchers = models.ManyToManyField(User, related_name='+')
+
+    class Meta:
+        app_label = 'auth'
+        ordering = ['-id']
+
+
+def seed(tickets, users):
+    call_command('migrate', verbosity=0)
+    if 'auth_ticket' in connection.introspection.table_names():
+        return
+
+    with connection.schema_editor() as editor:
+        editor.create_model(Project)
+        editor.create_model(Ticket)
+
+    rnd = random.Random(42)
+    with transaction.atomic():
+        User.objects.bulk_create([User(username='user%d' % i) for i in range(users)])
+        user_ids = list(User.objects.values_list('id', flat=True))
+
+        Project.objects.bulk_create([Project(owner_id=rnd.choice(user_ids))
+                                     for _ in range(max(1, tickets // 50))])
+        project_ids = list(Project.objects.values_list('id', flat=True))
+        Project.members.through.objects.bulk_create([
+            Project.members.through(project_id=project_id, user_id=user_id)
+            for project_id in project_ids for user_id in rnd.sample(user_ids, 3)
+        ])
+
+        Ticket.objects.bulk_create([
+            Ticket(project_id=rnd.choice(project_ids), assignee_id=rnd.choice(user_ids))
+            for _ in range(tickets)
+        ])
+        ticket_ids = list(Ticket.objects.values_list('id', flat=True))
+        Ticket.watchers.through.objects.bulk_create([
+            Ticket.watchers.through(ticket_id=ticket_id, user_id=user_id)
+            for ticket_id in ticket_ids for user_id in rnd.sample(user_ids, 2)
+        ])
+
+
+def measure(strategy, users, repeat):
+    backend = OwnerOrStaffFilterBackend()
+    view = SimpleNamespace(ownership_filter_fields=FIELDS, ownership_filter_strategy=strategy)
+    start = time.perf_counter()
+    for user in users * repeat:
+        queryset = backend.filter_queryset(SimpleNamespace(user=user), Ticket.objects.all(), view)
+        queryset.count()
+        list(queryset[:25])
+    return (time.perf_counter() - start) * 1000 / (len(users) * repeat)
+
+
+def main():
+    seed(args.tickets, args.users)
+    users = list(User.objects.order_by('?')[:5])
+
+    print('%d tickets, %d users, %s' % (Ticket.objects.count(), args.users, connection.vendor))
+    print('%-10s %18s' % ('strategy', 'ms per user page'))
+    for strategy in OWNERSHIP_STRATEGIES:
+        print('%-10s %18.2f' % (strategy, measure(strategy, users, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
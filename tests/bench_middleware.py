@@ -0,0 +1,77 @@
+"""
+Benchmark of the per-request overhead of :class:`ab_drf.middleware.HeadInfoMiddleware`.
+
+Compares a trivial view called directly with the same view behind the middleware::
+
+    python tests/bench_middleware.py [--requests 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        ALLOWED_HOSTS=['testserver'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes'],
+        SECRET_KEY='bench-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+
+from ab_drf.middleware import HeadInfoMiddleware
+
+BODY = b'{"success":true,"results":[%s]}' % b','.join(b'{"id":%d}' % i for i in range(200))
+
+
+def plain_view(request):
+    return HttpResponse(BODY, content_type='application/json')
+
+
+def streaming_view(request):
+    return StreamingHttpResponse(iter((BODY,)), content_type='application/json')
+
+
+def measure(handler, request, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        handler(request)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=100000)
+    args = parser.parse_args()
+
+    request = RequestFactory().get('/')
+
+    print('%-22s %12s %12s %14s' % ('case', 'view (us)', 'total (us)', 'overhead (us)'))
+    for name, view, server_timing in (
+        ('plain', plain_view, False),
+        ('streaming', streaming_view, False),
+        ('plain + server timing', plain_view, True),
+    ):
+        with override_settings(AB_DRF_SERVER_TIMING=server_timing):
+            middleware = HeadInfoMiddleware(view)
+
+        baseline = measure(view, request, args.requests)
+        total = measure(middleware, request, args.requests)
+        print('%-22s %12.2f %12.2f %14.2f' % (
+            name, baseline * 1e6, total * 1e6, (total - baseline) * 1e6
+        ))
+
+
+if __name__ == '__main__':
+    main()
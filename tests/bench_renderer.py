@@ -0,0 +1,89 @@
+"""
+Micro-benchmark for :class:`ab_drf.renderer.CustomRenderer`.
+
+Measures renders per second for success, paginated and error payloads of different sizes
+with every available JSON backend::
+
+    python tests/bench_renderer.py [--seconds 0.5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['rest_framework'],
+        SECRET_KEY='bench-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from ab_drf.encoders import orjson
+from ab_drf.renderer import CustomRenderer
+
+SIZES = (1, 100, 1000)
+BACKENDS = ('json', 'orjson') if orjson is not None else ('json',)
+
+
+def make_rows(size):
+    return [
+        {'id': i, 'name': 'Row %d' % i, 'email': 'row%d@example.com' % i, 'active': True,
+         'created_at': '2020-01-01T00:00:00Z', 'tags': ['a', 'b']}
+        for i in range(size)
+    ]
+
+
+def make_payloads(size):
+    rows = make_rows(size)
+    return {
+        'success': (status.HTTP_200_OK, {'response_data': {
+            'response_message': 'Fetched', 'results': rows, 'additional_info': {'size': size},
+        }}),
+        'paginated': (status.HTTP_200_OK, {
+            'links': {'next': None, 'previous': None}, 'count': size, 'results': rows,
+        }),
+        'error': (status.HTTP_400_BAD_REQUEST, {
+            'field_%d' % i: ['This field is required.'] for i in range(size)
+        }),
+    }
+
+
+def bench(renderer, data, status_code, seconds):
+    context = {'response': Response(data=data, status=status_code)}
+    timer = timeit.Timer(lambda: renderer.render(data, None, context))
+    number, elapsed = timer.autorange()
+    while elapsed < seconds:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return number / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=0.5,
+                        help='minimum measuring time per case')
+    args = parser.parse_args()
+
+    print('%-8s %-10s %6s %14s' % ('backend', 'payload', 'size', 'renders/s'))
+    for backend in BACKENDS:
+        renderer = CustomRenderer()
+        renderer.json_backend = backend
+        for size in SIZES:
+            for name, (status_code, data) in make_payloads(size).items():
+                rate = bench(renderer, data, status_code, args.seconds)
+                print('%-8s %-10s %6d %14.1f' % (backend, name, size, rate))
+
+
+if __name__ == '__main__':
+    main()
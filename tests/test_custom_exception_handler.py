@@ -2,6 +2,7 @@ import logging
 import os
 import sys
 import unittest
+import unittest.mock
 
 
 CURRENT_DIR = os.path.dirname(__file__)
@@ -36,7 +37,12 @@ if not settings.configured:  # pragma: no cover - defensive programming for test
 from rest_framework import status  # noqa: E402
 
 from ab_drf.errors import APIException, ErrorMessage  # noqa: E402
-from ab_drf.helpers import custom_exception_handler  # noqa: E402
+from ab_drf.helpers import custom_exception_handler, get_culprit  # noqa: E402
+from ab_drf.log_policy import get_exception_counts, reset_exception_counts  # noqa: E402
+
+
+def raise_value_error():
+    raise ValueError("boom")
 
 
 class DummyRequest:
@@ -83,5 +89,62 @@ class CustomExceptionHandlerTests(unittest.TestCase):
         self.assertEqual(response.data["type"], "APIException")
 
 
+class CulpritTests(unittest.TestCase):
+    def test_innermost_frame(self) -> None:
+        try:
+            raise_value_error()
+        except ValueError as exc:
+            culprit = get_culprit(exc)
+
+        self.assertEqual(culprit, "%s in raise_value_error" % __name__)
+
+    def test_uses_exception_being_handled(self) -> None:
+        try:
+            raise_value_error()
+        except ValueError:
+            culprit = get_culprit(APIException(*ErrorMessage.UNEXPECTED))
+
+        self.assertEqual(culprit, "%s in raise_value_error" % __name__)
+
+    def test_no_traceback(self) -> None:
+        self.assertIsNone(get_culprit(ValueError("boom")))
+
+    def test_logged_culprit(self) -> None:
+        try:
+            raise_value_error()
+        except ValueError as exc:
+            with self.assertLogs("app.ab_drf.helpers", logging.ERROR) as logs:
+                custom_exception_handler(exc, {"request": DummyRequest()})
+
+        self.assertEqual(logs.records[0].culprit, "%s in raise_value_error" % __name__)
+        self.assertEqual(logs.records[0].request_id, "dummy-request")
+
+    def test_skipped_when_not_logged(self) -> None:
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+        with unittest.mock.patch("ab_drf.helpers.get_culprit") as get_culprit_mock:
+            try:
+                raise_value_error()
+            except ValueError as exc:
+                custom_exception_handler(exc, {"request": DummyRequest()})
+
+        get_culprit_mock.assert_not_called()
+
+    def test_counted_by_type_when_not_logged(self) -> None:
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        reset_exception_counts()
+        self.addCleanup(reset_exception_counts)
+
+        for _ in range(2):
+            try:
+                raise_value_error()
+            except ValueError as exc:
+                custom_exception_handler(exc, {"request": DummyRequest()})
+
+        self.assertEqual(get_exception_counts()[("ValueError", None)], 2)
+
+
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
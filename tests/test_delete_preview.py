@@ -0,0 +1,181 @@
+import os
+import sys
+from unittest import mock
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        ROOT_URLCONF=__name__,
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ab_drf.helpers import (
+    BatchDeleter, count_deleted_objects, get_cascade_relations, get_deleted_objects,
+    get_deletion_preview_database,
+)
+
+urlpatterns = []
+
+
+def setUpModule():
+    call_command('migrate', verbosity=0)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class CountDeletedObjectsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.content_type = ContentType.objects.create(app_label='shop', model='order')
+        permissions = [
+            Permission.objects.create(
+                content_type=cls.content_type, codename='perm%d' % i, name='Perm %d' % i
+            )
+            for i in range(3)
+        ]
+        group = Group.objects.create(name='staff')
+        group.permissions.set(permissions)
+        for i in range(2):
+            user = User.objects.create(username='user%d' % i)
+            user.user_permissions.set(permissions[:2])
+            user.groups.add(group)
+
+    def test_cascade_relations(self):
+        relations = {
+            (model._meta.model_name, field.name) for model, field in get_cascade_relations(User)
+        }
+        self.assertEqual(relations, {('user_groups', 'user'), ('user_user_permissions', 'user')})
+
+    def test_same_counts_as_collector(self):
+        _, expected, _ = get_deleted_objects([self.content_type])
+
+        with self.assertNumQueries(3):
+            model_count = count_deleted_objects([self.content_type], limit=100)
+
+        self.assertEqual(model_count, expected)
+        self.assertEqual(model_count, {
+            'content types': 1,
+            'permissions': 3,
+            'group-permission relationships': 3,
+            'user-permission relationships': 4,
+        })
+
+    def test_stops_over_limit(self):
+        with self.assertNumQueries(1):
+            model_count = count_deleted_objects([self.content_type], limit=3)
+
+        self.assertEqual(model_count, {'content types': 1, 'permissions': 3})
+
+    def test_count_only(self):
+        self.assertEqual(
+            get_deleted_objects([self.content_type], count_only=True, limit=3),
+            (None, {'content types': 1, 'permissions': 3}, None)
+        )
+
+        with self.assertRaises(ValueError):
+            get_deleted_objects([self.content_type], count_only=True)
+
+    def test_no_objects(self):
+        self.assertEqual(count_deleted_objects([], limit=100), {})
+
+
+class DeletionPreviewDatabaseTests(TestCase):
+    def test_alias_of_the_objects(self):
+        user = User(username='replicated')
+        user._state.db = 'other'
+
+        self.assertEqual(get_deletion_preview_database([user]), 'other')
+        self.assertEqual(get_deletion_preview_database(User.objects.using('other')), 'other')
+        self.assertEqual(get_deletion_preview_database([User(username='new')]), 'default')
+        self.assertEqual(get_deletion_preview_database([]), 'default')
+
+    @override_settings(AB_DRF_DELETE_PREVIEW_DATABASE='replica')
+    def test_preview_database_setting(self):
+        user = User.objects.create(username='primary')
+
+        self.assertEqual(get_deletion_preview_database([user]), 'replica')
+        with mock.patch('ab_drf.helpers.NestedObjects') as nested_objects:
+            get_deleted_objects([user])
+        nested_objects.assert_called_once_with(using='replica')
+
+        with mock.patch('ab_drf.helpers.count_deleted_objects') as count:
+            get_deleted_objects([user], count_only=True, limit=10)
+        count.assert_called_once_with([user], 10, using='replica')
+
+
+class BatchDeleterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.content_type = ContentType.objects.create(app_label='shop', model='order')
+        permissions = [
+            Permission.objects.create(
+                content_type=self.content_type, codename='perm%d' % i, name='Perm %d' % i
+            )
+            for i in range(5)
+        ]
+        self.group = Group.objects.create(name='staff')
+        self.group.permissions.set(permissions)
+
+    def test_deletes_leaf_first_in_batches(self):
+        deleter = BatchDeleter(self.content_type, batch_size=2, pause=0.5)
+        progress = []
+        deleter.on_progress = progress.append
+        with mock.patch('ab_drf.helpers.time.sleep') as sleep, \
+                CaptureQueriesContext(connection) as queries:
+            total = deleter.run()
+
+        self.assertEqual(total, 11)
+        # After every batch, and after the object itself
+        self.assertEqual(progress, [2, 4, 5, 7, 9, 10, 11])
+        self.assertFalse(ContentType.objects.filter(pk=self.content_type.pk).exists())
+        self.assertFalse(Permission.objects.filter(codename__startswith='perm').exists())
+        self.assertEqual(Group.objects.count(), 1)
+        # 5 group permissions, then 5 permissions, 2 at a time
+        self.assertEqual(sleep.call_count, 6)
+        deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE')
+        ]
+        batch = 'DELETE FROM "auth_group_permissions" WHERE "auth_group_permissions"."id"'
+        # The group permissions go before any permission
+        self.assertEqual([i for i, sql in enumerate(deletes) if sql.startswith(batch)], [0, 1, 2])
+
+    def test_resumes_from_checkpoint(self):
+        key = 'ab_drf:delete:test'
+        with mock.patch('ab_drf.helpers.time.sleep', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                BatchDeleter(self.content_type, batch_size=2, pause=1,
+                             checkpoint_key=key).run()
+
+        self.assertEqual(cache.get(key), {'done': [], 'deleted': 4})
+        self.assertEqual(self.group.permissions.count(), 1)
+
+        # The emptied relation is not looked at again
+        group_permissions = '/auth.Permission.content_type/auth.Group_permissions.permission'
+        cache.set(key, {'done': [group_permissions], 'deleted': 4})
+        self.group.permissions.clear()
+
+        self.assertEqual(BatchDeleter(self.content_type, checkpoint_key=key).run(), 10)
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(Permission.objects.filter(codename__startswith='perm').exists())
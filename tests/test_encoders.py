@@ -0,0 +1,120 @@
+import datetime
+import decimal
+import io
+import os
+import sys
+import unittest
+import uuid
+from collections import OrderedDict
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['rest_framework'],
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from ab_drf.encoders import orjson
+from ab_drf.parsers import CustomJSONParser
+from ab_drf.renderer import CustomRenderer
+
+BACKENDS = ('json', 'orjson')
+
+
+def make_payload():
+    return {
+        'count': 2,
+        'next': None,
+        'previous': None,
+        'results': [
+            OrderedDict([
+                ('id', uuid.UUID('12345678123456781234567812345678')),
+                ('price', decimal.Decimal('10.25')),
+                ('created_at', datetime.datetime(2020, 1, 2, 3, 4, 5, 6789,
+                                                 tzinfo=datetime.timezone.utc)),
+                ('day', datetime.date(2020, 1, 2)),
+                ('label', gettext_lazy('Grün\u2028line')),
+                ('tags', ('a', 'b')),
+            ]),
+            {'id': 2, 'nested': {1: [1.5, True, None]}},
+        ],
+    }
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class JSONBackendParityTests(unittest.TestCase):
+    def render(self, backend, data, status_code, accepted_media_type=None):
+        renderer = CustomRenderer()
+        renderer.json_backend = backend
+        context = {'response': Response(data=data, status=status_code)}
+        return (
+            renderer.render(data, accepted_media_type, context),
+            b''.join(renderer.render_stream(data, accepted_media_type, context)),
+        )
+
+    def assertSameOutput(self, data, status_code, accepted_media_type=None):
+        outputs = [
+            output
+            for backend in BACKENDS
+            for output in self.render(backend, data, status_code, accepted_media_type)
+        ]
+        self.assertEqual(len(set(outputs)), 1, outputs)
+
+    def test_success_payload(self):
+        self.assertSameOutput(make_payload(), status.HTTP_200_OK)
+
+    def test_indented_payload(self):
+        self.assertSameOutput(make_payload(), status.HTTP_200_OK, 'application/json; indent=2')
+
+    def test_error_payload(self):
+        self.assertSameOutput({'name': ['This field is required.']}, status.HTTP_400_BAD_REQUEST)
+
+    def test_stdlib_output_matches_drf(self):
+        data = make_payload()
+        context = {'response': Response(data=data, status=status.HTTP_200_OK)}
+        renderer = CustomRenderer()
+        envelope = renderer.get_envelope(data, context)
+
+        self.assertEqual(
+            renderer.render(data, None, context),
+            super(CustomRenderer, renderer).render(envelope, None, context),
+        )
+
+
+class CustomJSONParserTests(unittest.TestCase):
+    def parse(self, backend, body):
+        parser = CustomJSONParser()
+        parser.json_backend = backend
+        return parser.parse(io.BytesIO(body), parser_context={'encoding': 'utf-8'})
+
+    def test_backends_parse_the_same_data(self):
+        body = '{"id": 1, "name": "Grün", "items": [1.5, null, true]}'.encode()
+
+        for backend in BACKENDS:
+            self.assertEqual(
+                self.parse(backend, body),
+                {'id': 1, 'name': 'Grün', 'items': [1.5, None, True]},
+            )
+
+    def test_invalid_json_raises_parse_error(self):
+        for backend in BACKENDS:
+            for body in (b'{"id": ', b'{"value": NaN}'):
+                with self.assertRaises(ParseError):
+                    self.parse(backend, body)
+
+
+if __name__ == '__main__':
+    unittest.main()
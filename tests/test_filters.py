@@ -0,0 +1,245 @@
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, models
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+
+from ab_drf.filters import (
+    ListFilterField, OwnerOrStaffFilterBackend, crosses_to_many, get_path_field, merge_ranges,
+)
+
+
+class Person(models.Model):
+    is_staff = models.BooleanField(default=False)
+    is_superuser = models.BooleanField(default=False)
+
+    class Meta:
+        app_label = 'auth'
+
+
+# Relations to a model of their own, the cascade of auth's User stays as other tests expect it
+class OwnedProject(models.Model):
+    owner = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='+')
+    members = models.ManyToManyField(Person, related_name='+')
+
+    class Meta:
+        app_label = 'auth'
+
+
+class OwnedTicket(models.Model):
+    project = models.ForeignKey(OwnedProject, on_delete=models.CASCADE)
+    assignee = models.ForeignKey(Person, null=True, on_delete=models.SET_NULL, related_name='+')
+    watchers = models.ManyToManyField(Person, related_name='+')
+    ref = models.UUIDField(default=uuid.uuid4)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        app_label = 'auth'
+        ordering = ['-id']
+
+
+def setUpModule():
+    with connection.schema_editor() as editor:
+        editor.create_model(Person)
+        editor.create_model(OwnedProject)
+        editor.create_model(OwnedTicket)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        editor.delete_model(OwnedTicket)
+        editor.delete_model(OwnedProject)
+        editor.delete_model(Person)
+
+
+class CrossesToManyTests(TestCase):
+    def test_crosses_to_many(self):
+        self.assertFalse(crosses_to_many(OwnedTicket, 'assignee'))
+        self.assertFalse(crosses_to_many(OwnedTicket, 'project__owner'))
+        self.assertFalse(crosses_to_many(OwnedTicket, 'project__owner__exact'))
+        self.assertTrue(crosses_to_many(OwnedTicket, 'watchers'))
+        self.assertTrue(crosses_to_many(OwnedTicket, 'project__members'))
+        self.assertTrue(crosses_to_many(OwnedProject, 'ownedticket__assignee'))
+
+
+class OwnerOrStaffFilterBackendTests(TestCase):
+    fields = ['assignee', 'project__owner', 'project__members', 'watchers']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Person.objects.create()
+        cls.other = Person.objects.create()
+        cls.staff = Person.objects.create(is_staff=True)
+
+        mine = OwnedProject.objects.create(owner=cls.user)
+        shared = OwnedProject.objects.create(owner=cls.other)
+        shared.members.add(cls.user, cls.other)
+        theirs = OwnedProject.objects.create(owner=cls.other)
+
+        cls.expected = [
+            OwnedTicket.objects.create(project=mine, assignee=cls.user),
+            OwnedTicket.objects.create(project=shared),
+            OwnedTicket.objects.create(project=theirs, assignee=cls.user),
+        ]
+        watched = OwnedTicket.objects.create(project=theirs)
+        watched.watchers.add(cls.user, cls.other)
+        cls.expected.append(watched)
+        OwnedTicket.objects.create(project=theirs, assignee=cls.other)
+
+    def filter(self, user, strategy=None):
+        view = SimpleNamespace(ownership_filter_fields=self.fields,
+                               ownership_filter_strategy=strategy)
+        request = SimpleNamespace(user=user)
+        return OwnerOrStaffFilterBackend().filter_queryset(request, OwnedTicket.objects.all(), view)
+
+    def test_strategies_give_the_same_rows(self):
+        expected = sorted(ticket.pk for ticket in self.expected)
+        for strategy in ('in', 'union', 'exists', 'auto'):
+            with self.subTest(strategy=strategy):
+                self.assertEqual(sorted(ticket.pk for ticket in self.filter(self.user, strategy)),
+                                 expected)
+
+    def test_auto(self):
+        self.assertIn('UNION', str(self.filter(self.user, 'auto').query))
+
+        self.fields = ['project__owner']
+        sql = str(self.filter(self.user, 'auto').query)
+        self.assertNotIn(' IN (', sql)
+        self.assertEqual(sorted(ticket.pk for ticket in self.filter(self.user, 'auto')),
+                         [self.expected[0].pk])
+
+        self.fields = ['watchers']
+        self.assertIn(' IN (', str(self.filter(self.user, 'auto').query))
+
+    @override_settings(AB_DRF_OWNERSHIP_FILTER_STRATEGY='union')
+    def test_setting(self):
+        self.assertIn('UNION', str(self.filter(self.user).query))
+
+    def test_staff_is_not_filtered(self):
+        self.assertEqual(self.filter(self.staff).count(), 5)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.filter(self.user, 'join')
+
+
+class ListFilterFieldTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.person = Person.objects.create()
+        project = OwnedProject.objects.create(owner=cls.person)
+        project.members.add(cls.person, Person.objects.create())
+        cls.tickets = [OwnedTicket.objects.create(project=project) for _ in range(10)]
+
+    def filter(self, value, field_name='id', **kwargs):
+        return ListFilterField(field_name=field_name, **kwargs).filter(
+            OwnedTicket.objects.all(), value
+        )
+
+    def pks(self, *indexes):
+        return sorted(self.tickets[i].pk for i in indexes)
+
+    def test_values_and_ranges(self):
+        first = self.tickets[0].pk
+        value = '%d-%d, %d,%d,%d' % (first, first + 2, first + 5, first + 5, first + 9)
+        queryset = self.filter(value)
+
+        self.assertEqual(sorted(ticket.pk for ticket in queryset), self.pks(0, 1, 2, 5, 9))
+        self.assertFalse(queryset.query.distinct)
+
+    def test_typed_values(self):
+        refs = '%s,%s' % (self.tickets[3].ref, str(self.tickets[4].ref).replace('-', ''))
+
+        self.assertEqual(sorted(ticket.pk for ticket in self.filter(refs, 'ref')),
+                         self.pks(3, 4))
+
+    def test_distinct_across_to_many(self):
+        members = ','.join(str(pk) for pk in self.tickets[0].project.members.values_list(
+            'pk', flat=True))
+        queryset = self.filter(members, 'project__members')
+
+        self.assertTrue(queryset.query.distinct)
+        self.assertEqual(queryset.count(), 10)
+
+    def test_chunks(self):
+        value = ','.join(str(ticket.pk) for ticket in self.tickets[::2])
+        queryset = self.filter(value, chunk_size=2)
+
+        self.assertEqual(str(queryset.query).count(' IN ('), 3)
+        self.assertEqual(sorted(ticket.pk for ticket in queryset), self.pks(0, 2, 4, 6, 8))
+
+    def test_array_parameter(self):
+        q = ListFilterField(field_name='id', array_threshold=2).get_condition(
+            [1, 5, 9], [], 'postgresql'
+        )
+
+        self.assertIn('unnest', str(q))
+
+    def test_invalid_values(self):
+        for value, kwargs in (('1,a', {}), ('5-1', {}), (',', {}), ('1,3,5', {'max_values': 2})):
+            with self.subTest(value=value), self.assertRaises(serializers.ValidationError):
+                self.filter(value, **kwargs)
+
+        with self.assertRaises(serializers.ValidationError):
+            self.filter('1-5', 'ref')
+
+    def test_backend_parameter_limit(self):
+        # Every other id: no ranges, one parameter each, SQLite takes 999
+        pks = range(1, 1998, 2)
+        value = ','.join(str(pk) for pk in pks)
+        with self.assertRaises(serializers.ValidationError):
+            self.filter(value)
+
+        self.assertEqual(self.filter(value, reserved_params=0).count(),
+                         len([ticket for ticket in self.tickets if ticket.pk in pks]))
+        # Ranges cost two parameters, whatever their length
+        self.assertEqual(self.filter('1-100000').count(), 10)
+
+    def test_get_path_field(self):
+        self.assertIs(get_path_field(OwnedTicket, 'project'), OwnedProject._meta.pk)
+        self.assertIs(get_path_field(OwnedTicket, 'project__members'), Person._meta.pk)
+        self.assertIs(get_path_field(OwnedTicket, 'ref'), OwnedTicket._meta.get_field('ref'))
+        self.assertIsInstance(get_path_field(OwnedTicket, 'created_at__date'), models.DateField)
+        self.assertIsInstance(get_path_field(OwnedTicket, 'created_at__year'),
+                              models.IntegerField)
+        self.assertIs(get_path_field(OwnedTicket, 'project__exact'), OwnedProject._meta.pk)
+
+    def test_transforms(self):
+        today = timezone.localdate()
+
+        self.assertEqual(self.filter(today.isoformat(), 'created_at__date').count(), 10)
+        self.assertEqual(self.filter('%d-%d' % (today.year - 1, today.year + 1),
+                                     'created_at__year').count(), 10)
+        self.assertEqual(self.filter(str(today.year - 1), 'created_at__year').count(), 0)
+        with self.assertRaises(serializers.ValidationError):
+            self.filter('today', 'created_at__date')
+
+    def test_merge_ranges(self):
+        self.assertEqual(merge_ranges([9, 1, 2, 7], [(3, 5), (20, 30)]),
+                         ([7, 9], [(1, 5), (20, 30)]))
+        self.assertEqual(merge_ranges([1, 2, 4], []), ([1, 2, 4], []))
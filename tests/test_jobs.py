@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.contrib.auth.models import User
+
+from ab_drf.jobs import DONE, FAILED, QUEUED, create_job, get_job, running_job, update_job
+
+
+class JobTests(unittest.TestCase):
+    def test_lifecycle(self):
+        job = create_job('app.tasks.export', User(pk=7))
+        self.assertEqual(get_job(job['id'])['status'], QUEUED)
+        self.assertEqual(job['user_id'], 7)
+
+        with running_job(job['id']):
+            self.assertEqual(get_job(job['id'])['status'], 'running')
+            update_job(job['id'], progress={'rows': 10})
+
+        job = get_job(job['id'])
+        self.assertEqual(job['status'], DONE)
+        self.assertEqual(job['progress'], {'rows': 10})
+        self.assertIsNotNone(job['updated_at'])
+
+    def test_failure_keeps_only_the_exception_type(self):
+        job = create_job('app.tasks.export')
+
+        with self.assertRaises(KeyError):
+            with running_job(job['id']):
+                raise KeyError('secret')
+
+        job = get_job(job['id'])
+        self.assertEqual(job['status'], FAILED)
+        self.assertEqual(job['error'], 'KeyError')
+
+    def test_without_job(self):
+        self.assertIsNone(update_job(None, status=DONE))
+        self.assertIsNone(update_job('missing', status=DONE))
+        with running_job(None):
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import logging
+import os
+import sys
+import unittest
+
+
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:  # pragma: no cover - defensive programming for test bootstrap
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="test-key",
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "rest_framework",
+            "ab_drf",
+        ],
+        DATABASES={
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": ":memory:",
+            }
+        },
+        USE_TZ=True,
+        MIDDLEWARE=[],
+    )
+    import django
+
+    django.setup()
+
+from django.core.exceptions import ImproperlyConfigured  # noqa: E402
+from django.test import SimpleTestCase, override_settings  # noqa: E402
+from rest_framework.exceptions import NotFound, ValidationError  # noqa: E402
+
+from ab_drf.helpers import custom_exception_handler  # noqa: E402
+from ab_drf.log_policy import (  # noqa: E402
+    get_exception_counts, get_log_rule, reset_exception_counts,
+)
+
+
+POLICY = {
+    "ValidationError": {"level": "INFO", "traceback": False},
+    "NotFound": {"log": False},
+    "4xx": {"traceback": False, "sample_rate": 0.0},
+    "default": {"level": "ERROR"},
+}
+
+
+class DummyRequest:
+    id = "dummy-request"
+    META = {}
+
+
+def handle(exc):
+    try:
+        raise exc
+    except Exception as exc:
+        return custom_exception_handler(exc, {"request": DummyRequest()})
+
+
+class LogRuleTests(SimpleTestCase):
+    def test_default_policy(self) -> None:
+        rule = get_log_rule(NotFound(), 404)
+        self.assertEqual(rule, (True, logging.WARNING, True, 1.0))
+
+    def test_unhandled(self) -> None:
+        rule = get_log_rule(ValueError(), None)
+        self.assertEqual(rule, (True, logging.ERROR, True, 1.0))
+
+    @override_settings(AB_DRF_EXCEPTION_LOG_POLICY=POLICY)
+    def test_lookup_order(self) -> None:
+        self.assertEqual(get_log_rule(ValidationError(), 400),
+                         (True, logging.INFO, False, 1.0))
+        self.assertEqual(get_log_rule(NotFound(), 404), (False, logging.ERROR, True, 1.0))
+        self.assertEqual(get_log_rule(Exception(), 403), (True, logging.ERROR, False, 0.0))
+        self.assertEqual(get_log_rule(Exception(), 500), (True, logging.ERROR, True, 1.0))
+
+    @override_settings(AB_DRF_EXCEPTION_LOG_POLICY={404: {"level": "DEBUG"}})
+    def test_status_code(self) -> None:
+        self.assertEqual(get_log_rule(NotFound(), 404).level, logging.DEBUG)
+
+    @override_settings(AB_DRF_EXCEPTION_LOG_POLICY={"default": {"level": "LOUD"}})
+    def test_invalid_level(self) -> None:
+        with self.assertRaises(ImproperlyConfigured):
+            get_log_rule(NotFound(), 404)
+
+
+@override_settings(AB_DRF_EXCEPTION_LOG_POLICY=POLICY)
+class PolicyLoggingTests(SimpleTestCase):
+    def setUp(self) -> None:
+        reset_exception_counts()
+        self.addCleanup(reset_exception_counts)
+
+    def test_level_without_traceback(self) -> None:
+        with self.assertLogs("app.ab_drf.helpers", logging.DEBUG) as logs:
+            handle(ValidationError({"name": ["Required."]}))
+
+        self.assertEqual(logs.records[0].levelno, logging.INFO)
+        self.assertFalse(logs.records[0].exc_info)
+
+    def test_suppressed_are_counted(self) -> None:
+        logger = logging.getLogger("app.ab_drf.helpers")
+        with self.assertLogs(logger, logging.DEBUG) as logs:
+            for _ in range(3):
+                handle(NotFound())
+            logger.info("nothing else")
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(get_exception_counts(), {("NotFound", "%s in handle" % __name__): 3})
+
+    def test_suppressed_since_last_record(self) -> None:
+        with self.assertLogs("app.ab_drf.helpers", logging.DEBUG) as logs:
+            handle(ValidationError({"name": ["Required."]}))
+            with override_settings(AB_DRF_EXCEPTION_LOG_POLICY=dict(POLICY, ValidationError={
+                "level": "INFO", "sample_rate": 0.0,
+            })):
+                handle(ValidationError({"name": ["Required."]}))
+                handle(ValidationError({"name": ["Required."]}))
+            handle(ValidationError({"name": ["Required."]}))
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(logs.records[0].suppressed, 0)
+        self.assertEqual(logs.records[1].occurrences, 4)
+        self.assertEqual(logs.records[1].suppressed, 2)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
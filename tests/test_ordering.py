@@ -0,0 +1,412 @@
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        ALLOWED_HOSTS=['testserver'],
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, models
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from rest_framework import permissions, serializers, status, viewsets
+from rest_framework.test import APIRequestFactory
+
+from ab_drf.helpers import update_order
+from ab_drf.mixins import ReorderViewSetMixin
+from ab_drf.ordering import (RebalanceInProgress, get_max_order, get_order_between, move,
+                             rebalance, rebalance_lists, rebalancing, reorder)
+
+
+class Task(models.Model):
+    name = models.CharField(max_length=50)
+    board = models.IntegerField(default=0)
+    the_order = models.PositiveIntegerField(default=0)
+    archived = models.BooleanField(default=False)
+
+    class Meta:
+        app_label = 'auth'
+        ordering = ['the_order']
+
+
+# The rebalance locks need a cache shared between processes
+shared_lock_cache = override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'locks': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                  'LOCATION': 'ab_drf_locks'},
+    },
+    AB_DRF_ORDER_LOCK_CACHE='locks',
+)
+
+
+def setUpModule():
+    shared_lock_cache.enable()
+    call_command('createcachetable', verbosity=0)
+    with connection.schema_editor() as editor:
+        editor.create_model(Task)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        editor.delete_model(Task)
+        editor.execute('DROP TABLE ab_drf_locks')
+    shared_lock_cache.disable()
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = ['id', 'name', 'the_order']
+
+
+class TaskViewSet(ReorderViewSetMixin, viewsets.GenericViewSet):
+    authentication_classes = []
+    permission_classes = []
+    serializer_class = TaskSerializer
+
+    def get_queryset(self):
+        return Task.objects.filter(archived=False)
+
+
+class IsNotLocked(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return not obj.name.startswith('locked')
+
+
+class GuardedTaskViewSet(TaskViewSet):
+    permission_classes = [IsNotLocked]
+
+
+class BoardTaskViewSet(TaskViewSet):
+    order_scope_fields = ['board']
+
+
+class ReorderTests(TestCase):
+    def setUp(self):
+        self.tasks = [Task.objects.create(name='task %d' % i, the_order=i) for i in range(5)]
+
+    def orders(self):
+        return list(Task.objects.values_list('name', flat=True))
+
+    def test_writes_only_changed_rows(self):
+        items = [{'id': task.pk, 'order': 4 - i} for i, task in enumerate(self.tasks)]
+        items[2]['order'] = 2
+
+        # in_bulk, the lock check, bulk_update, and the savepoint around them
+        with self.assertNumQueries(5):
+            changed = reorder(Task, items)
+
+        self.assertEqual(changed, 4)
+        self.assertEqual(self.orders(), ['task %d' % i for i in reversed(range(5))])
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].pk).the_order, 4)
+
+    @override_settings(AB_DRF_REORDER_SPREAD=True, AB_DRF_ORDER_GAP=10)
+    def test_spread(self):
+        items = [{'id': task.pk, 'order': 4 - i} for i, task in enumerate(self.tasks)]
+
+        reorder(Task, items)
+
+        self.assertEqual(self.orders(), ['task %d' % i for i in reversed(range(5))])
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].pk).the_order, 40)
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            reorder(Task, [{'id': self.tasks[0].pk, 'order': get_max_order(Task) + 1}])
+
+    def test_skips_placeholders_and_missing_objects(self):
+        changed = reorder(Task, [
+            {'id': 'None', 'order': 0}, {'order': 1}, {'id': 999, 'order': 0},
+            {'id': 'abc', 'order': 0}, {'id': str(self.tasks[4].pk), 'order': '0'},
+        ])
+
+        self.assertEqual(changed, 1)
+        self.assertEqual(Task.objects.get(pk=self.tasks[4].pk).the_order, 0)
+
+    def test_update_order(self):
+        order_data = json.dumps([{'id': self.tasks[0].pk, 'order': 9}])
+
+        self.assertEqual(update_order(order_data, Task), 1)
+        self.assertEqual(self.orders()[-1], 'task 0')
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].pk).the_order, 9)
+
+
+class ReorderViewSetMixinTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = TaskViewSet.as_view({'post': 'action_reorder'})
+        self.visible = Task.objects.create(name='visible', the_order=0)
+        self.archived = Task.objects.create(name='archived', the_order=1, archived=True)
+
+    def post(self, data):
+        return self.view(self.factory.post('/tasks/actions/reorder', data, format='json'))
+
+    def test_reorders_visible_objects(self):
+        response = self.post([
+            {'id': self.visible.pk, 'order': 5}, {'id': self.archived.pk, 'order': 6},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'changed': 1})
+        self.assertEqual(Task.objects.get(pk=self.visible.pk).the_order, 5)
+        self.assertEqual(Task.objects.get(pk=self.archived.pk).the_order, 1)
+
+    def test_conflict_while_rebalancing(self):
+        view = BoardTaskViewSet.as_view({'post': 'action_reorder'})
+        data = [{'id': self.visible.pk, 'order': 5}]
+
+        with rebalancing(Task, {'board': 0}):
+            response = view(self.factory.post('/tasks/actions/reorder', data, format='json'))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Task.objects.get(pk=self.visible.pk).the_order, 0)
+
+    def test_object_permissions_reject_the_whole_set(self):
+        locked = Task.objects.create(name='locked', the_order=2)
+        view = GuardedTaskViewSet.as_view({'post': 'action_reorder'})
+        data = [{'id': self.visible.pk, 'order': 5}, {'id': locked.pk, 'order': 6}]
+
+        response = view(self.factory.post('/tasks/actions/reorder', data, format='json'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        orders = Task.objects.filter(archived=False).values_list('the_order', flat=True)
+        self.assertEqual(list(orders), [0, 2])
+
+    def test_invalid_payload(self):
+        for data in ({'id': 1}, [1, 2], [{'id': self.visible.pk}],
+                     [{'id': self.visible.pk, 'order': 2 ** 40}]):
+            self.assertEqual(self.post(data).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderBetweenTests(TestCase):
+    def test_get_order_between(self):
+        self.assertEqual(get_order_between(1024, 2048, gap=1024), 1536)
+        self.assertEqual(get_order_between(2048, None, gap=1024), 3072)
+        self.assertEqual(get_order_between(None, 2048, gap=1024), 1024)
+        self.assertEqual(get_order_between(None, 10, gap=1024), 4)
+        self.assertEqual(get_order_between(None, None, gap=1024), 1024)
+
+    def test_no_room(self):
+        self.assertIsNone(get_order_between(3, 4, gap=1024))
+        self.assertIsNone(get_order_between(None, 0, gap=1024))
+
+    def test_maximum(self):
+        self.assertEqual(get_order_between(2040, None, gap=1024, maximum=2047), 2044)
+        self.assertIsNone(get_order_between(2047, None, gap=1024, maximum=2047))
+
+
+@override_settings(AB_DRF_ORDER_GAP=10)
+class MoveTests(TestCase):
+    def setUp(self):
+        self.tasks = [Task.objects.create(name='task %d' % i, the_order=(i + 1) * 10)
+                      for i in range(5)]
+
+    def names(self, board=0):
+        tasks = Task.objects.filter(board=board).order_by('the_order', 'pk')
+        return list(tasks.values_list('name', flat=True))
+
+    def orders(self, board=0):
+        return list(Task.objects.filter(board=board).values_list('the_order', flat=True))
+
+    def test_writes_one_row(self):
+        first, second, _, _, last = self.tasks
+
+        # the locked keys, the lock and adjacency checks, the update, and the savepoint
+        with self.assertNumQueries(6):
+            shifted = move(last, first, second)
+
+        self.assertFalse(shifted)
+        self.assertEqual(last.the_order, 15)
+        self.assertEqual(self.names(), ['task 0', 'task 4', 'task 1', 'task 2', 'task 3'])
+
+    def test_to_the_ends(self):
+        move(self.tasks[0], before=self.tasks[4])
+        move(self.tasks[3], after=self.tasks[1])
+
+        self.assertEqual(self.names(), ['task 3', 'task 1', 'task 2', 'task 4', 'task 0'])
+
+    def test_spreads_dense_keys(self):
+        Task.objects.all().delete()
+        tasks = [Task.objects.create(name='task %d' % i, the_order=i) for i in range(5)]
+        other = Task.objects.create(name='other', the_order=3, board=1)
+
+        self.assertFalse(move(tasks[4], tasks[0], tasks[1], scope_fields=['board']))
+
+        self.assertEqual(self.names(), ['task 0', 'task 4', 'task 1', 'task 2', 'task 3'])
+        self.assertEqual(self.orders(), [10, 15, 20, 30, 40])
+        self.assertEqual(Task.objects.get(pk=other.pk).the_order, 3)
+
+    @override_settings(AB_DRF_ORDER_INLINE_REBALANCE=3)
+    def test_shifts_when_out_of_room(self):
+        first, second, third, fourth, last = self.tasks
+        other = Task.objects.create(name='other', the_order=20, board=1)
+        for task in (third, fourth, last):
+            self.assertFalse(move(task, first, second, scope_fields=['board']))
+            second = task
+
+        # 10, 11, 12, 15 and 20: no room between the first two
+        second = Task.objects.get(pk=self.tasks[1].pk)
+        self.assertTrue(move(second, first, last, scope_fields=['board']))
+        self.assertEqual(self.names(), ['task 0', 'task 1', 'task 4', 'task 3', 'task 2'])
+        self.assertEqual(Task.objects.get(pk=other.pk).the_order, 20)
+
+        self.assertEqual(rebalance(Task, {'board': 0}), 4)
+        self.assertEqual(self.orders(), [10, 20, 30, 40, 50])
+        self.assertEqual(self.names(), ['task 0', 'task 1', 'task 4', 'task 3', 'task 2'])
+
+    def test_invalid_neighbours(self):
+        other = Task.objects.create(name='other', the_order=15, board=1)
+        with self.assertRaises(ValueError):
+            move(self.tasks[0], self.tasks[3], self.tasks[2])
+        with self.assertRaises(ValueError):
+            move(self.tasks[0])
+        with self.assertRaises(ValueError):
+            move(self.tasks[0], self.tasks[1], other, scope_fields=['board'])
+        with self.assertRaises(ValueError):
+            move(self.tasks[0], self.tasks[1], self.tasks[3])
+        with self.assertRaises(ValueError):
+            move(self.tasks[0], before=self.tasks[3])
+
+    def test_ties_are_broken_by_pk(self):
+        tied = Task.objects.create(name='tied', the_order=10)
+
+        with self.assertRaises(ValueError):
+            move(self.tasks[4], self.tasks[0], self.tasks[1])
+        move(self.tasks[4], tied, self.tasks[1])
+
+        self.assertEqual(self.names()[:3], ['task 0', 'tied', 'task 4'])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }, AB_DRF_ORDER_LOCK_CACHE='default')
+    def test_rebalance_needs_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            rebalance(Task)
+
+    def test_locked_while_rebalancing(self):
+        with rebalancing(Task, {}):
+            with self.assertRaises(RebalanceInProgress):
+                move(self.tasks[0], self.tasks[1], self.tasks[2])
+            with self.assertRaises(RebalanceInProgress):
+                rebalance(Task)
+
+        self.assertEqual(rebalance(Task), 0)
+
+
+@override_settings(AB_DRF_ORDER_GAP=10)
+class RebalanceTests(TestCase):
+    def names(self, board=0):
+        tasks = Task.objects.filter(board=board).order_by('the_order', 'pk')
+        return list(tasks.values_list('name', flat=True))
+
+    def orders(self, board=0):
+        return list(Task.objects.filter(board=board).values_list('the_order', flat=True))
+
+    def test_batches(self):
+        # Keys going down and up, and a tie broken by the pk
+        for i, order in enumerate((1, 2, 2, 95, 96, 97, 300)):
+            Task.objects.create(name='task %d' % i, the_order=order)
+        Task.objects.create(name='other', the_order=5, board=1)
+
+        self.assertEqual(rebalance(Task, {'board': 0}, batch_size=2), 7)
+
+        self.assertEqual(self.orders(), [10, 20, 30, 40, 50, 60, 70])
+        self.assertEqual(self.names(), ['task %d' % i for i in range(7)])
+        self.assertEqual(self.orders(board=1), [5])
+
+    def test_lists(self):
+        for board in (0, 1, 2):
+            for i in range(3):
+                Task.objects.create(name='task %d' % i, the_order=i, board=board)
+
+        self.assertEqual(rebalance_lists(Task, ['board'], batch_size=2), 9)
+        for board in (0, 1, 2):
+            self.assertEqual(self.orders(board), [10, 20, 30])
+
+    @override_settings(AB_DRF_ORDER_GAP=2 ** 30)
+    def test_field_range(self):
+        for i in range(5):
+            Task.objects.create(name='task %d' % i, the_order=i)
+
+        rebalance(Task)
+
+        gap = get_max_order(Task) // 5
+        self.assertEqual(self.orders(), [gap, 2 * gap, 3 * gap, 4 * gap, 5 * gap])
+
+
+class MoveViewSet(TaskViewSet):
+    order_scope_fields = ['board']
+    rebalanced = None
+
+    def schedule_rebalance(self, model, scope):
+        MoveViewSet.rebalanced = (model, scope)
+
+
+@override_settings(AB_DRF_ORDER_GAP=10, AB_DRF_ORDER_INLINE_REBALANCE=2)
+class MoveActionTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = MoveViewSet.as_view({'post': 'action_move'})
+        self.tasks = [Task.objects.create(name='task %d' % i, the_order=order)
+                      for i, order in enumerate((10, 20, 21))]
+        MoveViewSet.rebalanced = None
+
+    def post(self, task, data):
+        request = self.factory.post('/tasks/%s/actions/move' % task.pk, data, format='json')
+        return self.view(request, pk=task.pk)
+
+    def test_move(self):
+        response = self.post(self.tasks[1], {'before': None, 'after': self.tasks[0].pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.tasks[1].pk, 'order': 0})
+        self.assertIsNone(MoveViewSet.rebalanced)
+
+    def test_schedules_rebalance_when_shifted(self):
+        # Hidden from the user, still shifted along with its list
+        archived = Task.objects.create(name='archived', the_order=22, archived=True)
+        other = Task.objects.create(name='other', the_order=21, board=1)
+
+        response = self.post(self.tasks[0], {'before': self.tasks[1].pk,
+                                             'after': self.tasks[2].pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(MoveViewSet.rebalanced, (Task, {'board': 0}))
+        self.assertEqual(list(Task.objects.filter(board=0).values_list('name', flat=True)),
+                         ['task 1', 'task 0', 'task 2', 'archived'])
+        self.assertEqual(Task.objects.get(pk=archived.pk).the_order, 32)
+        self.assertEqual(Task.objects.get(pk=other.pk).the_order, 21)
+
+    def test_conflict_while_rebalancing(self):
+        with rebalancing(Task, {'board': 0}):
+            response = self.post(self.tasks[2], {'after': self.tasks[0].pk})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_invalid_neighbours(self):
+        archived = Task.objects.create(name='archived', the_order=9, archived=True)
+        other = Task.objects.create(name='other', the_order=15, board=1)
+        for data in ({}, {'after': archived.pk}, {'after': 'abc'},
+                     {'after': self.tasks[2].pk},
+                     {'before': self.tasks[1].pk, 'after': self.tasks[0].pk},
+                     {'before': self.tasks[0].pk, 'after': other.pk}):
+            response = self.post(self.tasks[2], data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
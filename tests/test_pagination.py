@@ -0,0 +1,255 @@
+import datetime
+import json
+import os
+import sys
+import unittest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        ALLOWED_HOSTS=['testserver'],
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ab_drf.pagination import CountStrategyPaginator, CustomPagination, KeysetPagination
+from ab_drf.renderer import CustomRenderer
+
+
+def setUpModule():
+    call_command('migrate', 'auth', verbosity=0)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        # Three users share each timestamp to exercise the `id` tie-breaker
+        User.objects.bulk_create([
+            User(username='user%02d' % i, date_joined=start + datetime.timedelta(days=i // 3))
+            for i in range(20)
+        ])
+        cls.expected = list(
+            User.objects.order_by('-date_joined', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = type('View', (), {'keyset_ordering': ('-date_joined', '-id')})
+
+    def paginate(self, url):
+        paginator = KeysetPagination()
+        paginator.page_size = 6
+        request = Request(self.factory.get(url))
+        page = paginator.paginate_queryset(User.objects.all(), request, self.view)
+        response = paginator.get_paginated_response([user.id for user in page])
+        return response.data
+
+    def test_walks_forward_and_backward_over_ties(self):
+        data = self.paginate('/users')
+        self.assertEqual(set(data), {'links', 'count', 'next', 'previous', 'results'})
+        self.assertIsNone(data['links']['previous'])
+
+        pages = [data['results']]
+        while data['links']['next']:
+            data = self.paginate(data['links']['next'])
+            pages.append(data['results'])
+
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [6, 6, 6, 2])
+
+        backward = []
+        while data['links']['previous']:
+            data = self.paginate(data['links']['previous'])
+            backward.append(data['results'])
+
+        self.assertEqual(backward, pages[-2::-1])
+        self.assertIsNotNone(data['links']['next'])
+
+    def walk(self):
+        data = self.paginate('/users')
+        results = list(data['results'])
+        while data['links']['next']:
+            data = self.paginate(data['links']['next'])
+            results.extend(data['results'])
+        return results
+
+    def test_row_comparison_seek(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.paginate(self.paginate('/users')['links']['next'])
+
+        self.assertIn('("auth_user"."date_joined", "auth_user"."id") <', queries[-1]['sql'])
+
+    def test_mixed_directions(self):
+        self.view.keyset_ordering = ('date_joined', '-id')
+
+        self.assertEqual(self.walk(), list(
+            User.objects.order_by('date_joined', '-id').values_list('id', flat=True)
+        ))
+
+    def test_seek_without_row_comparison(self):
+        paginator = KeysetPagination()
+        paginator.ordering = ('-date_joined', '-id')
+        paginator.fields = [User._meta.get_field('date_joined'), User._meta.get_field('id')]
+        user = User.objects.order_by('-date_joined', '-id')[4]
+        seek = paginator.get_seek_filter([user.date_joined, user.id], vendor='oracle')
+
+        self.assertEqual(list(User.objects.filter(seek).order_by('-date_joined', '-id')
+                              .values_list('id', flat=True)), self.expected[5:])
+        self.assertIn('"auth_user"."date_joined" <=', str(User.objects.filter(seek).query))
+
+    def test_pages_through_the_rendered_envelope(self):
+        def get(url):
+            paginator = KeysetPagination()
+            paginator.page_size = 6
+            request = Request(self.factory.get(url))
+            page = paginator.paginate_queryset(User.objects.all(), request, self.view)
+            response = paginator.get_paginated_response([user.id for user in page])
+            return json.loads(CustomRenderer().render(
+                response.data, renderer_context={'response': response}
+            ))
+
+        envelope = get('/users')
+        self.assertIsNone(envelope['count'])
+        self.assertIsNone(envelope['previous'])
+
+        results = list(envelope['results'])
+        while envelope['next']:
+            envelope = get(envelope['next'])
+            results.extend(envelope['results'])
+
+        self.assertEqual(results, self.expected)
+        self.assertIsNotNone(envelope['previous'])
+
+    def test_nullable_ordering_is_refused(self):
+        self.view.keyset_ordering = ('-last_login', '-id')
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.paginate('/users')
+
+    def test_invalid_cursor_raises_not_found(self):
+        for cursor in ('garbage', 'eyJwIjpbXX0='):
+            with self.assertRaises(NotFound):
+                self.paginate('/users?cursor=%s' % cursor)
+
+
+class CountStrategyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username='user%02d' % i) for i in range(20)])
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.factory = APIRequestFactory()
+
+    def paginate(self, strategy, queryset=None):
+        paginator = CustomPagination()
+        paginator.count_strategy = strategy
+        request = Request(self.factory.get('/users?page=2'))
+        queryset = User.objects.order_by('id') if queryset is None else queryset
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response([user.id for user in page]).data
+
+    def test_exact_count(self):
+        with self.assertNumQueries(2):
+            data = self.paginate('exact')
+
+        self.assertEqual(data['count'], 20)
+        self.assertEqual(data['num_pages'], 3)
+        self.assertFalse(data['count_is_approximate'])
+
+    def test_cached_count_skips_count_query(self):
+        self.paginate('cached')
+
+        with self.assertNumQueries(1):
+            data = self.paginate('cached')
+
+        self.assertEqual(data['count'], 20)
+        self.assertTrue(data['count_is_approximate'])
+        self.assertEqual(len(data['results']), 9)
+
+    def test_cache_key_depends_on_filters(self):
+        queryset = User.objects.order_by('id')
+        key = CountStrategyPaginator(queryset, 9).get_count_cache_key()
+
+        self.assertEqual(key, CountStrategyPaginator(queryset.order_by('-id'), 9)
+                         .get_count_cache_key())
+        self.assertNotEqual(key, CountStrategyPaginator(queryset.filter(id__gt=3), 9)
+                            .get_count_cache_key())
+
+    def test_estimated_count_falls_back_to_exact(self):
+        # SQLite keeps no planner statistics
+        data = self.paginate('estimated')
+
+        self.assertEqual(data['count'], 20)
+        self.assertFalse(data['count_is_approximate'])
+
+    def test_approximate_count_does_not_clip_pages(self):
+        paginator = CountStrategyPaginator(User.objects.order_by('id'), 9,
+                                           count_strategy='estimated')
+        paginator.get_estimated_count = lambda: 10
+
+        page = paginator.page(3)
+
+        self.assertTrue(paginator.count_is_approximate)
+        self.assertEqual(len(page.object_list), 2)
+
+
+class PageLinksTests(unittest.TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def get_page_links(self, url, window=5):
+        paginator = CustomPagination()
+        paginator.page_links_window = window
+        paginator.paginate_queryset(list(range(100)), Request(self.factory.get(url)))
+        return paginator.get_paginated_response([]).data['page_links']
+
+    def test_window_around_current_page(self):
+        links = self.get_page_links('/users?page=6&search=a')
+
+        self.assertEqual([link['number'] for link in links], [4, 5, 6, 7, 8])
+        self.assertEqual([link['is_active'] for link in links],
+                         [False, False, True, False, False])
+        self.assertEqual(links[0]['url'], 'http://testserver/users?page=4&search=a')
+
+    def test_window_is_clamped_to_page_range(self):
+        links = self.get_page_links('/users?page=2', window=4)
+
+        self.assertEqual([link['number'] for link in links], [1, 2, 3, 4])
+        self.assertEqual(links[0]['url'], 'http://testserver/users')
+
+        links = self.get_page_links('/users?page=12', window=4)
+        self.assertEqual([link['number'] for link in links], [9, 10, 11, 12])
+
+    def test_page_links_can_be_turned_off(self):
+        self.assertEqual(self.get_page_links('/users?page=2&page_links=false'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import sys
+from types import SimpleNamespace
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import TestCase
+
+from ab_drf.permissions import IsOwnerPermissions, compile_ownership_path
+
+
+# DO_NOTHING keeps these out of the cascade of auth's User, as other tests expect it
+class Board(models.Model):
+    owner = models.ForeignKey(User, null=True, on_delete=models.DO_NOTHING, related_name='+')
+    group = models.ForeignKey(Group, null=True, on_delete=models.DO_NOTHING, related_name='+')
+
+    class Meta:
+        app_label = 'auth'
+
+
+class Card(models.Model):
+    board = models.ForeignKey(Board, on_delete=models.DO_NOTHING)
+    author = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+')
+
+    class Meta:
+        app_label = 'auth'
+
+    @property
+    def reviewer(self):
+        return self.board.owner
+
+
+def setUpModule():
+    call_command('migrate', verbosity=0)
+    with connection.schema_editor() as editor:
+        editor.create_model(Board)
+        editor.create_model(Card)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        editor.delete_model(Card)
+        editor.delete_model(Board)
+
+
+class CardView:
+    ownership_fields = ['author', 'board__owner']
+
+
+class CompileOwnershipPathTests(TestCase):
+    def test_compile(self):
+        path = compile_ownership_path(Card, 'board__owner')
+        self.assertEqual([hop.name for hop in path.hops], ['board'])
+        self.assertEqual(path.field.attname, 'owner_id')
+
+        path = compile_ownership_path(Card, 'board__owner__id')
+        self.assertEqual([hop.name for hop in path.hops], ['board'])
+        self.assertEqual(path.field.attname, 'owner_id')
+
+        path = compile_ownership_path(Card, 'author_id')
+        self.assertEqual(path.hops, ())
+        self.assertEqual(path.field.attname, 'author_id')
+
+    def test_not_compiled(self):
+        for field in ('reviewer', 'board__card__author', 'board__group', 'board__missing'):
+            with self.subTest(field=field):
+                self.assertIsNone(compile_ownership_path(Card, field))
+
+
+class IsOwnerPermissionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.author = User.objects.create(username='author')
+        cls.other = User.objects.create(username='other')
+        cls.board = Board.objects.create(owner=cls.owner)
+        cls.card_id = Card.objects.create(board=cls.board, author=cls.author).pk
+
+    def has_permission(self, user, card, view=None):
+        request = SimpleNamespace(user=user, method='PATCH')
+        return IsOwnerPermissions().has_object_permission(request, view or CardView(), card)
+
+    def test_author_without_queries(self):
+        card = Card.objects.get(pk=self.card_id)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.has_permission(self.author, card))
+
+    def test_board_owner(self):
+        card = Card.objects.get(pk=self.card_id)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.has_permission(self.owner, card))
+
+        card = Card.objects.select_related('board').get(pk=self.card_id)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.has_permission(self.owner, card))
+
+    def test_denied(self):
+        card = Card.objects.select_related('board').get(pk=self.card_id)
+        self.assertFalse(self.has_permission(self.other, card))
+        self.assertFalse(self.has_permission(AnonymousUser(), card))
+
+    def test_null_owner(self):
+        card = Card.objects.get(pk=self.card_id)
+        Board.objects.filter(pk=self.board.pk).update(owner=None)
+
+        with self.assertNumQueries(1):
+            self.assertFalse(self.has_permission(self.owner, card))
+
+        card.board.owner_id = None
+        with self.assertNumQueries(0):
+            self.assertFalse(self.has_permission(AnonymousUser(), card))
+
+    def test_fallback_to_attributes(self):
+        view = SimpleNamespace(ownership_fields=['reviewer'])
+        card = Card.objects.get(pk=self.card_id)
+
+        self.assertTrue(self.has_permission(self.owner, card, view))
+        self.assertFalse(self.has_permission(self.author, card, view))
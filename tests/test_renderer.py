@@ -54,6 +54,14 @@ class CustomRendererTests(unittest.TestCase):
         self.assertEqual(rendered['count'], 1)
         self.assertEqual(rendered['results'], [{'id': 1}])
 
+    def test_paginated_response_keeps_count_is_approximate(self):
+        payload = {'count': 1000, 'count_is_approximate': True, 'results': [{'id': 1}]}
+
+        rendered = self.render(payload, status.HTTP_200_OK)
+
+        self.assertEqual(rendered['count'], 1000)
+        self.assertTrue(rendered['count_is_approximate'])
+
     def test_created_response_with_response_data_message(self):
         payload = {
             'response_data': {
@@ -78,6 +86,13 @@ class CustomRendererTests(unittest.TestCase):
         self.assertEqual(rendered['status'], status.HTTP_204_NO_CONTENT)
         self.assertNotIn('results', rendered)
 
+    def test_accepted_response_is_a_success(self):
+        rendered = self.render({'job_id': 'abc', 'status': 'queued'}, status.HTTP_202_ACCEPTED)
+
+        self.assertTrue(rendered['success'])
+        self.assertEqual(rendered['message'], 'Accepted')
+        self.assertEqual(rendered['results'], {'job_id': 'abc', 'status': 'queued'})
+
     def test_bad_request_with_detail_message(self):
         payload = {'detail': 'Invalid input'}
 
@@ -90,6 +105,50 @@ class CustomRendererTests(unittest.TestCase):
             ['Invalid input'],
         )
 
+    def render_stream(self, data, status_code, accepted_media_type=None):
+        response = Response(data=data, status=status_code)
+        context = {'response': response}
+        return (
+            b''.join(self.renderer.render_stream(data, accepted_media_type, context)),
+            self.renderer.render(data, accepted_media_type, context),
+        )
+
+    def test_stream_matches_render_for_paginated_payload(self):
+        payload = {
+            'count': 3,
+            'next': None,
+            'previous': None,
+            'results': [{'id': 1, 'name': 'Grün'}, {'id': 2, 'name': '\u2028'}, {'id': 3}],
+            'additional_info': {'page': 1},
+        }
+
+        streamed, rendered = self.render_stream(payload, status.HTTP_200_OK)
+
+        self.assertEqual(streamed, rendered)
+
+    def test_stream_matches_render_for_lazy_and_empty_results(self):
+        rows = [{'id': 1}, {'id': 2}]
+
+        streamed, _ = self.render_stream(
+            {'count': 2, 'results': iter(rows)}, status.HTTP_200_OK
+        )
+        _, rendered = self.render_stream({'count': 2, 'results': rows}, status.HTTP_200_OK)
+        self.assertEqual(streamed, rendered)
+
+        streamed, rendered = self.render_stream([], status.HTTP_200_OK)
+        self.assertEqual(streamed, rendered)
+
+    def test_stream_matches_render_for_indent_and_errors(self):
+        streamed, rendered = self.render_stream(
+            [{'id': 1}], status.HTTP_200_OK, 'application/json; indent=4'
+        )
+        self.assertEqual(streamed, rendered)
+
+        streamed, rendered = self.render_stream(
+            {'username': ['This field is required.']}, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(streamed, rendered)
+
     def test_bad_request_with_field_errors(self):
         payload = {'username': ['This field is required.']}
 
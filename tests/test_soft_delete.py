@@ -0,0 +1,198 @@
+import datetime
+import os
+import sys
+import types
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+# ab_drf.tasks needs celery, which isn't a requirement: nothing is queued here
+celery_module = types.ModuleType('celery')
+celery_module.task = lambda func: func
+sys.modules.setdefault('celery', celery_module)
+
+from django.db import connection, models
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from ab_drf.helpers import in_purge_window, purge_soft_deleted
+from ab_drf.mixins import AddUpdateTimeModelMixin, SoftDeleteModelMixin
+from ab_drf.viewsets import MyModelViewSet
+
+
+class Note(SoftDeleteModelMixin, AddUpdateTimeModelMixin):
+    title = models.CharField(max_length=50)
+
+    class Meta:
+        app_label = 'auth'
+
+
+class Line(models.Model):
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'auth'
+
+
+def setUpModule():
+    with connection.schema_editor() as editor:
+        editor.create_model(Note)
+        editor.create_model(Line)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        editor.delete_model(Line)
+        editor.delete_model(Note)
+
+
+class SoftDeleteModelMixinTests(TestCase):
+    def setUp(self):
+        self.note = Note.objects.create(title='first')
+        Line.objects.bulk_create([Line(note=self.note) for _ in range(3)])
+
+    def test_delete_is_one_update(self):
+        with self.assertNumQueries(1):
+            self.note.delete()
+
+        self.assertIsNotNone(self.note.deleted_at)
+        self.assertFalse(Note.objects.filter(pk=self.note.pk).exists())
+        self.assertTrue(Note.all_objects.filter(pk=self.note.pk).exists())
+        self.assertEqual(Line.objects.count(), 3)
+
+        self.note.restore()
+        self.assertTrue(Note.objects.filter(pk=self.note.pk).exists())
+
+    def test_queryset_delete(self):
+        Note.objects.create(title='second')
+
+        with self.assertNumQueries(1):
+            deleted, per_model = Note.objects.all().delete()
+
+        self.assertEqual((deleted, per_model), (2, {'auth.Note': 2}))
+        self.assertEqual(Note.objects.count(), 0)
+        self.assertEqual(Note.all_objects.dead().count(), 2)
+
+    def test_hard_delete(self):
+        self.note.hard_delete()
+
+        self.assertFalse(Note.all_objects.exists())
+        self.assertFalse(Line.objects.exists())
+
+
+class SoftDeleteViewSetTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.notes = [Note.objects.create(title='note %d' % i) for i in range(3)]
+        Line.objects.bulk_create([Line(note=note) for note in self.notes for _ in range(2)])
+
+    def get_view(self, actions):
+        return MyModelViewSet.as_view(actions, queryset=Note.objects.all(),
+                                      authentication_classes=[], permission_classes=[])
+
+    def test_destroy_skips_preview(self):
+        note = self.notes[0]
+        view = self.get_view({'delete': 'destroy'})
+
+        # get_object and the UPDATE, the cascade is left to the purge
+        with self.assertNumQueries(2):
+            response = view(self.factory.delete('/notes/%s' % note.pk), pk=note.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNotNone(Note.all_objects.get(pk=note.pk).deleted_at)
+        self.assertEqual(Line.objects.count(), 6)
+
+    def test_bulk_destroy(self):
+        view = self.get_view({'post': 'action_bulk_destroy'})
+        ids = [note.pk for note in self.notes[:2]]
+
+        response = view(self.factory.post('/notes/actions/bulk_destroy', {'ids': ids},
+                                          format='json'))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Note.objects.values_list('title', flat=True)), ['note 2'])
+        self.assertEqual(Note.all_objects.count(), 3)
+        self.assertEqual(Line.objects.count(), 6)
+
+    def test_bulk_destroy_goes_through_perform_destroy(self):
+        destroyed = []
+
+        class NoteViewSet(MyModelViewSet):
+            def perform_destroy(self, instance):
+                destroyed.append(instance.pk)
+                super().perform_destroy(instance)
+
+        view = NoteViewSet.as_view({'post': 'action_bulk_destroy'}, queryset=Note.objects.all(),
+                                   authentication_classes=[], permission_classes=[])
+        ids = [note.pk for note in self.notes[:2]]
+
+        view(self.factory.post('/notes/actions/bulk_destroy', {'ids': ids}, format='json'))
+
+        self.assertEqual(sorted(destroyed), ids)
+        self.assertEqual(Note.objects.count(), 1)
+
+
+@override_settings(AB_DRF_SOFT_DELETE_RETENTION=3600, AB_DRF_DELETE_BATCH_SIZE=2)
+class PurgeSoftDeletedTests(TestCase):
+    def setUp(self):
+        self.old = Note.objects.create(title='old')
+        Line.objects.bulk_create([Line(note=self.old) for _ in range(5)])
+        self.recent = Note.objects.create(title='recent')
+        self.alive = Note.objects.create(title='alive')
+
+        now = timezone.now()
+        Note.all_objects.filter(pk=self.old.pk).update(
+            deleted_at=now - datetime.timedelta(hours=2)
+        )
+        Note.all_objects.filter(pk=self.recent.pk).update(deleted_at=now)
+
+    def test_purges_past_retention(self):
+        self.assertEqual(purge_soft_deleted(), 1)
+
+        self.assertEqual(
+            set(Note.all_objects.values_list('title', flat=True)), {'recent', 'alive'}
+        )
+        self.assertFalse(Line.objects.exists())
+
+    def test_only_within_the_window(self):
+        now = timezone.now()
+        hour = timezone.localtime(now).hour
+
+        with override_settings(AB_DRF_PURGE_HOURS=((hour + 1) % 24, (hour + 2) % 24)):
+            self.assertEqual(purge_soft_deleted(now), 0)
+        self.assertTrue(Note.all_objects.filter(pk=self.old.pk).exists())
+
+        with override_settings(AB_DRF_PURGE_HOURS=(hour, (hour + 1) % 24)):
+            self.assertEqual(purge_soft_deleted(now), 1)
+
+    def test_purge_window(self):
+        def at(hour):
+            return timezone.make_aware(datetime.datetime(2020, 1, 1, hour))
+
+        self.assertTrue(in_purge_window(at(12)))
+        with override_settings(AB_DRF_PURGE_HOURS=(1, 5)):
+            self.assertTrue(in_purge_window(at(1)))
+            self.assertFalse(in_purge_window(at(5)))
+        with override_settings(AB_DRF_PURGE_HOURS=(22, 4)):
+            self.assertTrue(in_purge_window(at(23)))
+            self.assertTrue(in_purge_window(at(3)))
+            self.assertFalse(in_purge_window(at(12)))
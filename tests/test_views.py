@@ -0,0 +1,198 @@
+import os
+import sys
+import threading
+import unittest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        ALLOWED_HOSTS=['testserver'],
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import SimpleTestCase, override_settings
+from django.urls import path
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from ab_drf.jobs import DONE, RUNNING, create_job, update_job
+from ab_drf.mixins import StreamingListViewSetMixin
+from ab_drf.renderer import CustomRenderer
+from ab_drf.views import BatchView, JobStatusView
+
+
+class EchoView(APIView):
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'user': request.user.username,
+            'q': request.query_params.get('q'),
+            'thread': threading.get_ident(),
+        })
+
+    def post(self, request, *args, **kwargs):
+        if 'name' not in request.data:
+            return Response({'name': ['This field is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(request.data, status=status.HTTP_201_CREATED)
+
+
+class RowSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+
+
+class StreamingRowViewSet(StreamingListViewSetMixin, mixins.ListModelMixin,
+                          viewsets.GenericViewSet):
+    renderer_classes = [CustomRenderer]
+    serializer_class = RowSerializer
+
+    def get_queryset(self):
+        return [{'id': pk} for pk in range(3)]
+
+
+urlpatterns = [
+    path('echo', EchoView.as_view()),
+    path('rows', StreamingRowViewSet.as_view({'get': 'list'})),
+    path('batch', BatchView.as_view()),
+    path('jobs/<str:job_id>', JobStatusView.as_view(), name='job-status'),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class BatchViewTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User(username='batch-user')
+
+    def batch(self, data):
+        request = self.factory.post('/batch', data, format='json')
+        force_authenticate(request, self.user)
+        return BatchView.as_view()(request)
+
+    def test_runs_items_in_order_as_the_batch_user(self):
+        response = self.batch([
+            {'method': 'GET', 'path': '/echo?q=first'},
+            {'method': 'POST', 'path': '/echo', 'body': {'name': 'new'}},
+            {'method': 'POST', 'path': '/echo', 'body': {}},
+            {'method': 'GET', 'path': '/missing'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first, created, invalid, missing = response.data
+
+        self.assertTrue(first['success'])
+        self.assertEqual(first['results']['user'], 'batch-user')
+        self.assertEqual(first['results']['q'], 'first')
+        self.assertEqual(created['status'], status.HTTP_201_CREATED)
+        self.assertEqual(created['results'], {'name': 'new'})
+        self.assertFalse(invalid['success'])
+        self.assertEqual(invalid['error'], {'name': 'This field is required.'})
+        self.assertEqual(missing['status'], status.HTTP_404_NOT_FOUND)
+
+    def test_streaming_list_items(self):
+        rows, = self.batch([{'method': 'GET', 'path': '/rows'}]).data
+
+        self.assertTrue(rows['success'])
+        self.assertEqual(rows['results'], [{'id': 0}, {'id': 1}, {'id': 2}])
+
+    def test_parallel_gets_keep_their_order(self):
+        response = self.batch({'parallel': True, 'requests': [
+            {'path': '/echo?q=%d' % i} for i in range(6)
+        ]})
+
+        self.assertEqual([item['results']['q'] for item in response.data],
+                         [str(i) for i in range(6)])
+        self.assertNotIn(threading.get_ident(),
+                         {item['results']['thread'] for item in response.data})
+
+    def test_gets_after_a_write_run_in_the_request_thread(self):
+        response = self.batch({'parallel': True, 'requests': [
+            {'path': '/echo?q=0'},
+            {'method': 'POST', 'path': '/echo', 'body': {'name': 'new'}},
+            {'path': '/echo?q=2'},
+            {'path': '/echo?q=3'},
+        ]})
+
+        threads = [item['results'].get('thread') for item in response.data]
+        self.assertNotEqual(threads[0], threading.get_ident())
+        self.assertEqual(threads[2:], [threading.get_ident()] * 2)
+
+    def test_allow_header(self):
+        request = self.factory.options('/batch')
+        force_authenticate(request, self.user)
+        response = BatchView.as_view()(request)
+
+        self.assertEqual(response['Allow'], 'POST, OPTIONS')
+
+    def test_nested_batch_is_rejected(self):
+        response = self.batch([{'method': 'POST', 'path': '/batch', 'body': []}])
+
+        self.assertEqual(response.data[0]['status'], status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_payload(self):
+        for data in ([], [{'path': 'echo'}], [{'path': '/echo', 'method': 'TRACE'}],
+                     [{'path': '/echo'}] * 21):
+            self.assertEqual(self.batch(data).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class JobStatusViewTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User(pk=1, username='owner')
+
+    def get(self, job_id, user):
+        request = self.factory.get('/jobs/%s' % job_id)
+        force_authenticate(request, user)
+        return JobStatusView.as_view()(request, job_id=job_id)
+
+    def test_reports_status_and_progress(self):
+        job = create_job('ab_drf.tasks.delete_objects', self.user)
+        self.assertEqual(self.get(job['id'], self.user).data['status'], 'queued')
+
+        update_job(job['id'], status=RUNNING, progress={'deleted': 500})
+        response = self.get(job['id'], self.user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], RUNNING)
+        self.assertEqual(response.data['progress'], {'deleted': 500})
+        self.assertNotIn('user_id', response.data)
+
+        update_job(job['id'], status=DONE)
+        self.assertEqual(self.get(job['id'], self.user).data['status'], DONE)
+
+    def test_other_users_jobs_are_hidden(self):
+        job = create_job('ab_drf.tasks.delete_objects', self.user)
+
+        other = User(pk=2, username='other')
+        self.assertEqual(self.get(job['id'], other).status_code, status.HTTP_404_NOT_FOUND)
+        staff = User(pk=3, username='staff', is_staff=True)
+        self.assertEqual(self.get(job['id'], staff).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get('missing', self.user).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unowned_jobs_are_for_staff(self):
+        job = create_job('ab_drf.tasks.purge_soft_deleted')
+
+        self.assertEqual(self.get(job['id'], self.user).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get(job['id'], AnonymousUser()).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        staff = User(pk=3, username='staff', is_staff=True)
+        self.assertEqual(self.get(job['id'], staff).status_code, status.HTTP_200_OK)
+
+
+if __name__ == '__main__':
+    unittest.main()
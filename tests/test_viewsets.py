@@ -0,0 +1,305 @@
+import json
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from django.conf import settings
+import django
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+        ],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        ALLOWED_HOSTS=['testserver'],
+        SECRET_KEY='test-key',
+        USE_TZ=True,
+    )
+
+django.setup()
+
+# ab_drf.tasks needs celery, which isn't a requirement: the tasks are patched where queued
+celery_module = types.ModuleType('celery')
+celery_module.task = lambda func: func
+sys.modules.setdefault('celery', celery_module)
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from ab_drf.jobs import FAILED, QUEUED, get_job
+from ab_drf.mixins import OffloadViewSetMixin, StreamingListViewSetMixin, offload
+from ab_drf.pagination import CustomPagination
+from ab_drf.renderer import CustomRenderer
+from ab_drf.viewsets import MyModelViewSet
+
+
+class Row:
+    def __init__(self, pk):
+        self.id = pk
+        self.name = 'row %s' % pk
+
+
+class RowSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class RowViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    authentication_classes = []
+    permission_classes = []
+    renderer_classes = [CustomRenderer]
+    serializer_class = RowSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return [Row(pk) for pk in range(1, 21)]
+
+
+class StreamingRowViewSet(StreamingListViewSetMixin, RowViewSet):
+    pass
+
+
+class StreamingListViewSetMixinTests(unittest.TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def get(self, viewset, path='/rows', **initkwargs):
+        view = viewset.as_view({'get': 'list'}, **initkwargs)
+        response = view(self.factory.get(path))
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.render().content
+
+    def test_streams_byte_identical_list(self):
+        streaming, streamed = self.get(StreamingRowViewSet)
+        regular, rendered = self.get(RowViewSet)
+
+        self.assertTrue(streaming.streaming)
+        self.assertEqual(streaming['Content-Type'], 'application/json')
+        self.assertEqual(streamed, rendered)
+        self.assertEqual(len(json.loads(streamed)['results']), 20)
+
+    def test_streams_byte_identical_paginated_list(self):
+        streaming, streamed = self.get(
+            StreamingRowViewSet, '/rows?page=2', pagination_class=CustomPagination
+        )
+        regular, rendered = self.get(
+            RowViewSet, '/rows?page=2', pagination_class=CustomPagination
+        )
+
+        self.assertTrue(streaming.streaming)
+        self.assertEqual(streamed, rendered)
+        self.assertEqual(json.loads(streamed)['count'], 20)
+
+    def test_errors_are_not_streamed(self):
+        response, content = self.get(
+            StreamingRowViewSet, '/rows?page=9', pagination_class=CustomPagination
+        )
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_items_are_not_streamed(self):
+        request = self.factory.get('/rows')
+        request.batch_item = True
+        response = StreamingRowViewSet.as_view({'get': 'list'})(request)
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data), 20)
+
+
+export_task = mock.Mock()
+export_task.name = 'app.tasks.export'
+
+
+class ExportViewSet(OffloadViewSetMixin, viewsets.GenericViewSet):
+    authentication_classes = []
+    permission_classes = []
+    offload_threshold = 10
+
+    @offload(lambda view, request: (int(request.query_params['rows']), ['csv']), export_task)
+    def export(self, request):
+        return Response({'exported': True})
+
+
+urlpatterns = [
+    path('jobs/<str:job_id>', lambda request, job_id: None, name='job-status'),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class OffloadViewSetMixinTests(SimpleTestCase):
+    def setUp(self):
+        export_task.reset_mock()
+        self.view = ExportViewSet.as_view({'get': 'export'})
+        self.factory = APIRequestFactory()
+
+    def test_runs_cheap_calls_inline(self):
+        response = self.view(self.factory.get('/export', {'rows': 10}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'exported': True})
+        export_task.delay.assert_not_called()
+
+    def test_offloads_expensive_calls(self):
+        response = self.view(self.factory.get('/export', {'rows': 11}))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        export_task.delay.assert_called_once_with('csv', job_id=job_id)
+        self.assertEqual(response.data['status'], QUEUED)
+        self.assertEqual(response.data['status_url'], 'http://testserver/jobs/%s' % job_id)
+        self.assertEqual(get_job(job_id)['name'], 'app.tasks.export')
+
+
+class Folder(models.Model):
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        app_label = 'auth'
+
+
+class Document(models.Model):
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'auth'
+
+
+def setUpModule():
+    call_command('migrate', 'contenttypes', verbosity=0)
+    with connection.schema_editor() as editor:
+        editor.create_model(Folder)
+        editor.create_model(Document)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        editor.delete_model(Document)
+        editor.delete_model(Folder)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class DestroyTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.folder = Folder.objects.create(name='folder')
+        Document.objects.bulk_create([Document(folder=self.folder) for _ in range(3)])
+
+    def delete(self, **initkwargs):
+        view = MyModelViewSet.as_view(
+            {'delete': 'destroy'}, queryset=Folder.objects.all(),
+            authentication_classes=[], permission_classes=[], **initkwargs
+        )
+        return view(self.factory.delete('/folders/%s' % self.folder.pk), pk=self.folder.pk)
+
+    def test_small_delete_runs_inline(self):
+        with mock.patch('ab_drf.viewsets.delete_objects') as delete_objects:
+            response = self.delete()
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Folder.objects.exists())
+        self.assertFalse(Document.objects.exists())
+        delete_objects.delay.assert_not_called()
+
+    def test_large_delete_is_offloaded_as_a_job(self):
+        with mock.patch('ab_drf.viewsets.delete_objects') as delete_objects:
+            delete_objects.name = 'ab_drf.tasks.delete_objects'
+            response = self.delete(offload_threshold=3)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        content_type = ContentType.objects.get_for_model(Folder)
+        delete_objects.delay.assert_called_once_with(self.folder.pk, content_type.id,
+                                                     job_id=job_id)
+        self.assertEqual(response.data['status'], QUEUED)
+        self.assertEqual(response.data['status_url'], 'http://testserver/jobs/%s' % job_id)
+        self.assertEqual(get_job(job_id)['name'], 'ab_drf.tasks.delete_objects')
+        self.assertEqual(Document.objects.count(), 3)
+
+    def test_job_fails_when_it_cannot_be_queued(self):
+        job_ids = []
+
+        def delay(*args, job_id):
+            job_ids.append(job_id)
+            raise ConnectionError('broker is down')
+
+        with mock.patch('ab_drf.viewsets.delete_objects') as delete_objects:
+            delete_objects.name = 'ab_drf.tasks.delete_objects'
+            delete_objects.delay.side_effect = delay
+            with self.assertRaises(ConnectionError):
+                self.delete(offload_threshold=3)
+
+        job = get_job(job_ids[0])
+        self.assertEqual((job['status'], job['error']), (FAILED, 'ConnectionError'))
+        self.assertEqual(Document.objects.count(), 3)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class BulkDestroyTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.folders = [Folder.objects.create(name='folder %d' % i) for i in range(3)]
+        self.hidden = Folder.objects.create(name='hidden')
+        Document.objects.bulk_create([Document(folder=folder) for folder in self.folders])
+
+    def post(self, data, **initkwargs):
+        view = MyModelViewSet.as_view(
+            {'post': 'action_bulk_destroy'}, queryset=Folder.objects.exclude(name='hidden'),
+            authentication_classes=[], permission_classes=[], **initkwargs
+        )
+        return view(self.factory.post('/folders/actions/bulk_destroy', data, format='json'))
+
+    def names(self):
+        return list(Folder.objects.order_by('pk').values_list('name', flat=True))
+
+    def test_small_delete_runs_inline(self):
+        ids = [self.folders[0].pk, str(self.folders[1].pk), self.hidden.pk, 999]
+
+        with mock.patch('ab_drf.viewsets.delete_objects') as delete_objects:
+            response = self.post({'ids': ids})
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.names(), ['folder 2', 'hidden'])
+        self.assertEqual(Document.objects.count(), 1)
+        delete_objects.delay.assert_not_called()
+
+    def test_large_delete_enqueues_one_task(self):
+        ids = [folder.pk for folder in self.folders[:2]]
+
+        with mock.patch('ab_drf.viewsets.delete_objects') as delete_objects:
+            delete_objects.name = 'ab_drf.tasks.delete_objects'
+            response = self.post({'ids': ids}, offload_threshold=3)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        content_type = ContentType.objects.get_for_model(Folder)
+        delete_objects.delay.assert_called_once_with(
+            ids, content_type.id, job_id=response.data['job_id']
+        )
+        self.assertEqual(Folder.objects.count(), 4)
+
+    def test_invalid_ids(self):
+        for data in ({}, {'ids': []}, {'ids': str(self.folders[0].pk)}, {'ids': ['a']},
+                     {'ids': list(range(1001))}):
+            response = self.post(data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+        self.assertEqual(Folder.objects.count(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()